@@ -1,9 +1,39 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing, contextmanager
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-import openpyxl
+from datetime import datetime, timedelta
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from analitico import (
+    COLUNAS_EXIBICAO, COLUNAS_PLANILHA, DIMENSOES_CUBO, FORMATOS_EXPORTACAO, MEDIDAS_CUBO, TAMANHO_BLOCO_EXPORTACAO,
+    DadosDetalhados, ErroEsquema, MotorCubo, MotorFiltros, agregar_linhas, atualizar_serie_temporal,
+    blocos_exportacao, calcular_cubo, chave_ordenacao, chaves_registro, combinar_quarentenas,
+    construir_indice_busca, construir_serie_temporal, filtrar_faixa, formatar_pagina, indicadores_mensais,
+    mensal_dos_filtros, montar_dados_detalhados, montar_filtros, motor_cubo_linhas, normalizar_texto,
+    ordenar_posicoes, pesquisar, processar_dados, resumir_categorias, resumir_comunidade, resumir_regional,
+    resumir_visao_geral,
+)
+from graficos import (
+    COR_PRINCIPAL, COR_SECUNDARIA, COR_TEXTO, figura_comunidade, figuras_categorias, figuras_regional,
+    figuras_visao_geral,
+)
+from ingestao import MonitorPasta, carregar_conteudo, chave_conteudo, combinar_planilhas
+
+# Copy-on-write: fatias e colunas derivadas nunca alteram os DataFrames compartilhados entre
+# sessões (caches do processo e pasta monitorada); cada sessão guarda só filtros e posições
+pd.set_option('mode.copy_on_write', True)
 
 # Configuração da página
 st.set_page_config(
@@ -13,11 +43,53 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Cores da empresa
-COR_PRINCIPAL = "#000000"
-COR_SECUNDARIA = "#F7931E"
-COR_FUNDO = "#FFFFFF"
-COR_TEXTO = "#333333"
+# Limite de memória do cache de planilhas processadas (MB)
+LIMITE_CACHE_MB = int(os.environ.get("SESMT_CACHE_MB", "512"))
+
+# Quantidade máxima de figuras Plotly prontas mantidas em cache
+LIMITE_CACHE_FIGURAS = 64
+
+# Perfil de desempenho: SESMT_PERFIL=1 (ou ?perfil=1 na URL) liga; SESMT_PERFIL_LOG grava JSON lines
+PERFIL_ATIVO = os.environ.get("SESMT_PERFIL", "") not in ("", "0")
+CAMINHO_LOG_PERFIL = os.environ.get("SESMT_PERFIL_LOG", "")
+
+# Ordenações dos detalhes das ações comunitárias: rótulo -> (coluna, decrescente)
+ORDENS_COMUNIDADE = {
+    'Data (mais antigas)': ('Data', False),
+    'Data (mais recentes)': ('Data', True),
+    'Pessoas Impactadas': ('Pessoas Impactadas', True),
+}
+
+# Grade da aba de dados: colunas com filtro de texto e tamanhos de página
+COLUNAS_FILTRO_GRADE = ['Evento', 'Colaborador', 'Contrato', 'Tipo', 'Observações']
+TAMANHOS_PAGINA_GRADE = (25, 50, 100, 250)
+
+# Arquivos de exportação gerados sob demanda (removidos após o download ou depois da validade)
+PASTA_EXPORTACOES = os.environ.get(
+    "SESMT_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "sesmt_exportacoes")
+)
+VALIDADE_EXPORTACAO_S = 3600
+
+# Threads que pré-calculam as abas em paralelo (0, o padrão, calcula tudo na thread do script).
+# Medido no benchmark, o pool pouco ganha: os cálculos das abas disputam o GIL
+TRABALHADORES_ABAS = int(os.environ.get("SESMT_TRABALHADORES", "0"))
+
+# Banco analítico local opcional (SQLite); vazio mantém tudo em memória na sessão
+CAMINHO_BANCO = os.environ.get("SESMT_DB_PATH", "")
+
+# Pasta monitorada opcional: substitui o upload (e o banco local) por uma base única do processo,
+# relida em segundo plano quando as planilhas da pasta mudam
+PASTA_MONITORADA = os.environ.get("SESMT_WATCH_DIR", "")
+INTERVALO_MONITORAMENTO_S = float(os.environ.get("SESMT_WATCH_INTERVAL", "30"))
+
+# Filtros multisseleção da sidebar (coluna: rótulo)
+FILTROS_DIMENSAO = {
+    'Tipo': 'Tipo de Ação',
+    'Contrato': 'Contrato/Região',
+    'Evento': 'Evento',
+    'Colaborador': 'Colaborador',
+    'Cargo': 'Cargo',
+}
 
 # CSS Customizado
 st.markdown(f"""
@@ -168,473 +240,1482 @@ st.markdown(f"""
 
 
 # Funções auxiliares
-def criar_layout_cores():
-    """Retorna configuração de layout para gráficos Plotly"""
-    return dict(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font=dict(family="Poppins, sans-serif", color=COR_TEXTO),
-        title_font=dict(size=20, color=COR_PRINCIPAL, family="Poppins, sans-serif"),
-        hoverlabel=dict(bgcolor="white", font_size=12, font_family="Poppins"),
+def perfil_ativo():
+    """Indica se as etapas devem ser cronometradas nesta execução"""
+    return PERFIL_ATIVO or st.query_params.get("perfil") == "1"
+
+
+def memoria_processo_mb():
+    """Memória residente do processo em MB (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def medir(etapa, linhas=None):
+    """Cronometra a etapa e registra linhas e variação de memória quando o perfil está ativo
+
+    O dicionário retornado aceita 'linhas' preenchido depois, dentro do bloco.
+    """
+    registro = {'etapa': etapa, 'linhas': linhas}
+    if not perfil_ativo():
+        yield registro
+        return
+
+    memoria_inicial = memoria_processo_mb()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        memoria_final = memoria_processo_mb()
+        registro['segundos'] = round(time.perf_counter() - inicio, 4)
+        registro['memoria_mb'] = (
+            round(memoria_final - memoria_inicial, 1) if memoria_final is not None and memoria_inicial is not None
+            else None
+        )
+        st.session_state.setdefault('perfil_execucao', []).append(registro)
+
+        if CAMINHO_LOG_PERFIL:
+            with open(CAMINHO_LOG_PERFIL, 'a', encoding='utf-8') as log:
+                log.write(json.dumps({'momento': datetime.now().isoformat(), **registro}, default=str) + '\n')
+
+
+def cronometrado(etapa):
+    """Decorador que mede cada chamada da função como uma etapa do perfil"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return executar
+    return decorador
+
+
+class CacheLRU:
+    """Cache LRU limitado pelo tamanho total dos itens, medido pela função informada"""
+
+    def __init__(self, limite, medir=lambda item: 1):
+        self.limite = limite
+        self.medir = medir
+        self._itens = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            self._itens.move_to_end(chave)
+            return item[0]
+
+    def guardar(self, chave, item):
+        tamanho = self.medir(item)
+        with self._lock:
+            if chave in self._itens:
+                self._total -= self._itens.pop(chave)[1]
+            self._itens[chave] = (item, tamanho)
+            self._total += tamanho
+
+            # Descartar os menos usados, mantendo sempre o mais recente
+            while self._total > self.limite and len(self._itens) > 1:
+                _, (_, tamanho_antigo) = self._itens.popitem(last=False)
+                self._total -= tamanho_antigo
+
+
+@st.cache_resource
+def obter_cache_planilhas():
+    """Cache de planilhas processadas, limitado pela memória e compartilhado entre sessões"""
+    return CacheLRU(
+        LIMITE_CACHE_MB * 1024 * 1024,
+        medir=lambda carregada: sum(int(df.memory_usage(deep=True).sum()) for df in carregada)
     )
 
 
-def processar_dados(df):
-    """Processa os dados do arquivo"""
-    import locale
+@st.cache_resource
+def obter_cache_bases():
+    """Cache de bases combinadas de várias planilhas (pela sequência de hashes), compartilhado entre sessões"""
+    return CacheLRU(LIMITE_CACHE_MB * 1024 * 1024, medir=lambda base: int(base['df'].memory_usage(deep=True).sum()))
+
+
+@st.cache_resource
+def obter_cache_figuras():
+    """Cache de figuras Plotly prontas, compartilhado entre reruns e sessões"""
+    return CacheLRU(LIMITE_CACHE_FIGURAS)
+
+
+def assinatura_dados(dados):
+    """Hash do conteúdo (valores e nomes de colunas) de um DataFrame agregado"""
+    valores = pd.util.hash_pandas_object(dados, index=False).to_numpy()
+    return hashlib.sha1(valores.tobytes() + repr(list(dados.columns)).encode()).hexdigest()
+
+
+def obter_figura(construtor, dados, **opcoes):
+    """Figura memoizada pelo construtor, pelo conteúdo dos dados e pelas opções
+
+    As figuras em cache são compartilhadas: quem as recebe não deve alterá-las.
+    """
+    chave = (construtor.__name__, assinatura_dados(dados), repr(sorted(opcoes.items())))
+
+    cache = obter_cache_figuras()
+    figura = cache.obter(chave)
+    if figura is None:
+        with medir(f"figura: {construtor.__name__}", linhas=len(dados)):
+            figura = construtor(dados, **opcoes)
+        cache.guardar(chave, figura)
+
+    return figura
+
+
+def carregar_planilha(uploaded_file):
+    """Planilha enviada lida por ingestao.carregar_conteudo, reaproveitada pelo hash do conteúdo
+
+    Retorna (chave, df, quarentena); a quarentena ainda não traz o nome do arquivo
+    (ver combinar_quarentenas), já que o mesmo conteúdo pode chegar com outro nome.
+    """
+    conteudo = uploaded_file.getvalue()
+    chave = chave_conteudo(conteudo)
+
+    cache = obter_cache_planilhas()
+    carregada = cache.obter(chave)
+    if carregada is None:
+        # Snapshot quando existir; senão leitura, validação e processamento da planilha
+        with st.spinner("Lendo planilha..."), medir('carga da planilha') as etapa:
+            _, df, quarentena = carregar_conteudo(conteudo)
+            etapa['linhas'] = len(df)
+
+        carregada = (df, quarentena)
+        cache.guardar(chave, carregada)
+
+    return chave, *carregada
+
+
+def mesclar_planilhas(uploaded_files):
+    """Combina as planilhas enviadas, processando apenas as novas ou alteradas
+
+    Retorna a base {'chave', 'df', 'quarentena', 'serie', 'duplicadas'} (serie
+    é None para uma planilha só). Bases combinadas ficam num cache do processo, pela
+    sequência de hashes: sessões que enviam os mesmos arquivos compartilham a
+    mesma base, e a sessão guarda apenas a sequência que usou por último. A
+    quarentena fica fora do cache: é rotulada com os nomes dos arquivos desta sessão.
+    Quando os arquivos enviados são os anteriores mais novos ao final, só as
+    linhas dos novos são anexadas (ingestao.combinar_planilhas); as que
+    repetem um registro já presente (mesma CHAVE_REGISTRO) são descartadas.
+    Repetições dentro de um mesmo arquivo são mantidas. A série temporal da
+    base é atualizada só com as linhas anexadas.
+    """
+    entradas = [carregar_planilha(arquivo) for arquivo in uploaded_files]
+    quarentena = combinar_quarentenas({
+        arquivo.name: quarentena_arquivo for arquivo, (_, _, quarentena_arquivo) in zip(uploaded_files, entradas)
+    })
+    if len(entradas) == 1:
+        chave, df, _ = entradas[0]
+        return {'chave': chave, 'df': df, 'quarentena': quarentena, 'serie': None, 'duplicadas': 0}
+
+    hashes = tuple(chave for chave, _, _ in entradas)
+    bases = obter_cache_bases()
+
+    combinada = bases.obter(hashes)
+    if combinada is not None:
+        st.session_state['base_combinada'] = hashes
+        return dict(combinada, quarentena=quarentena)
+
+    anteriores = st.session_state.get('base_combinada')
+    estado = bases.obter(anteriores) if anteriores is not None else None
+
+    if estado is not None and hashes[:len(anteriores)] == anteriores:
+        base = estado['df']
+        serie = estado['serie']
+        chaves_existentes = estado['chaves_registro']
+        duplicadas = estado['duplicadas']
+        novas = entradas[len(anteriores):]
+    else:
+        base = None
+        serie = None
+        chaves_existentes = None
+        duplicadas = 0
+        novas = entradas
+
+    # Rótulos de mês e categorias são refeitos sobre a base combinada (sem reler arquivos)
+    df, anexadas, chaves_existentes, descartadas = combinar_planilhas(
+        [df_arquivo for _, df_arquivo, _ in novas], base, chaves_existentes
+    )
+    duplicadas += descartadas
+    chave = hashlib.sha256('|'.join(hashes).encode()).hexdigest()
+
+    with medir('série temporal'):
+        if serie is None:
+            serie = construir_serie_temporal(df)
+        else:
+            serie = atualizar_serie_temporal(serie, anexadas)
+
+    combinada = {
+        'chave': chave,
+        'df': df,
+        'chaves_registro': chaves_existentes,
+        'duplicadas': duplicadas,
+        'serie': serie,
+    }
+    bases.guardar(hashes, combinada)
+    st.session_state['base_combinada'] = hashes
+    return dict(combinada, quarentena=quarentena)
+
+
+@st.cache_resource
+def obter_monitor(pasta, intervalo):
+    """Monitor da pasta de planilhas, iniciado uma vez por processo e compartilhado entre sessões"""
+    return MonitorPasta(pasta, intervalo).iniciar()
+
+
+@st.fragment(run_every=INTERVALO_MONITORAMENTO_S)
+def acompanhar_pasta(versao):
+    """Situação da pasta monitorada; reexecuta a página quando uma nova versão é publicada"""
+    monitor = obter_monitor(PASTA_MONITORADA, INTERVALO_MONITORAMENTO_S)
+    base = monitor.atual
+
+    if (base.versao if base is not None else None) != versao:
+        st.rerun()
+
+    if base is None:
+        st.caption(f"Aguardando planilhas em {PASTA_MONITORADA}")
+    else:
+        st.caption(
+            f"Versão {base.versao} de {base.atualizada_em:%d/%m/%Y %H:%M} · "
+            f"{len(base.arquivos)} planilha(s)"
+        )
+    if monitor.erro:
+        st.warning(f"Falha ao ler a pasta monitorada: {monitor.erro}")
+
+
+@st.cache_resource
+def preparar_banco(caminho):
+    """Cria tabelas e índices do banco local (uma vez por processo)"""
+    colunas = ', '.join(f'"{coluna}"' for coluna in COLUNAS_PLANILHA)
+
+    with closing(sqlite3.connect(caminho)) as conexao, conexao:
+        conexao.execute(f'CREATE TABLE IF NOT EXISTS acoes ({colunas}, chave_registro INTEGER, arquivo TEXT)')
+        conexao.execute('CREATE TABLE IF NOT EXISTS arquivos (hash TEXT PRIMARY KEY, importado_em TEXT, linhas INTEGER)')
+        conexao.execute('CREATE INDEX IF NOT EXISTS idx_acoes_data ON acoes ("Data")')
+        conexao.execute('CREATE INDEX IF NOT EXISTS idx_acoes_contrato ON acoes ("Contrato")')
+        conexao.execute('CREATE INDEX IF NOT EXISTS idx_acoes_tipo ON acoes ("Tipo")')
+        conexao.execute('CREATE INDEX IF NOT EXISTS idx_acoes_chave ON acoes (chave_registro)')
+
+    return caminho
+
+
+def conectar_banco():
+    """Nova conexão com o banco local (conexões SQLite não são compartilhadas entre threads)
+
+    A função normalizar() da pesquisa no banco usa a mesma normalização de texto
+    da pesquisa em memória.
+    """
+    conexao = sqlite3.connect(preparar_banco(CAMINHO_BANCO))
+    conexao.create_function(
+        'normalizar', 1, lambda valor: '' if valor is None else normalizar_texto(valor), deterministic=True
+    )
+    return closing(conexao)
+
+
+def importar_no_banco(chave, df):
+    """Grava no banco as linhas de uma planilha ainda não importada
+
+    Registros cuja CHAVE_REGISTRO já existe no banco (vindos de outra planilha)
+    são ignorados, como na mesclagem em memória.
+    """
+    with conectar_banco() as conexao, conexao:
+        if conexao.execute('SELECT 1 FROM arquivos WHERE hash = ?', (chave,)).fetchone():
+            return
+
+        linhas = df[[coluna for coluna in COLUNAS_PLANILHA if coluna in df.columns]].copy()
+        linhas['chave_registro'] = chaves_registro(df).view(np.int64)
+        linhas['arquivo'] = chave
+        linhas.to_sql('importacao', conexao, if_exists='replace', index=False)
+
+        colunas = ', '.join(f'"{coluna}"' for coluna in linhas.columns)
+        inseridas = conexao.execute(f"""
+            INSERT INTO acoes ({colunas})
+            SELECT {colunas} FROM importacao
+            WHERE chave_registro NOT IN (SELECT chave_registro FROM acoes)
+        """).rowcount
+        conexao.execute('DROP TABLE importacao')
+        conexao.execute(
+            'INSERT INTO arquivos VALUES (?, ?, ?)',
+            (chave, datetime.now().isoformat(timespec='seconds'), inseridas)
+        )
+
+
+def versao_banco():
+    """Identificador do conteúdo do banco (muda a cada planilha importada)"""
+    with conectar_banco() as conexao:
+        quantidade, ultima = conexao.execute('SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM arquivos').fetchone()
+    return f"{quantidade}-{ultima}"
+
+
+def clausula_filtros(filtros, ignorar=None):
+    """WHERE parametrizado equivalente a MotorFiltros.filtrar (opcionalmente ignorando uma coluna)"""
+    inicio, fim, selecoes = filtros
+    condicoes, parametros = [], []
+
+    if inicio is not None:
+        condicoes.append('"Data" >= ? AND "Data" < ?')
+        parametros += [f"{inicio:%Y-%m-%d}", f"{fim + timedelta(days=1):%Y-%m-%d}"]
+
+    for coluna, valores in selecoes:
+        if coluna == ignorar:
+            continue
+        condicoes.append(f'"{coluna}" IN ({", ".join("?" * len(valores))})')
+        parametros += list(valores)
+
+    return (' WHERE ' + ' AND '.join(condicoes) if condicoes else ''), parametros
+
+
+@st.cache_data(max_entries=4)
+def consultar_resumo_banco(versao):
+    """Quantidade de registros e período disponível no banco, para montar os filtros"""
+    with conectar_banco() as conexao:
+        registros, min_data, max_data, pessoas = conexao.execute(
+            'SELECT COUNT(*), MIN("Data"), MAX("Data"), COUNT("Pessoas Impactadas") FROM acoes'
+        ).fetchone()
+
+    return {
+        'registros': registros,
+        'pessoas_ausentes': registros - pessoas,
+        'min_date': pd.Timestamp(min_data) if min_data else None,
+        'max_date': pd.Timestamp(max_data) if max_data else None,
+    }
 
-    # Tentar configurar locale para português
-    try:
-        locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
-    except:
+
+@st.cache_resource(max_entries=32)
+def consultar_cubo_banco(versao, filtros):
+    """Cubo de agregados calculado pelo banco (GROUP BY com os filtros aplicados no WHERE)
+
+    O período é aplicado às linhas no WHERE, então os meses das bordas já
+    chegam parciais e o cubo vale para qualquer período diário.
+
+    Como os demais resultados compartilhados entre sessões, é somente leitura.
+    """
+    where, parametros = clausula_filtros(filtros)
+
+    with conectar_banco() as conexao:
+        cubo = pd.read_sql_query(f"""
+            SELECT strftime('%Y-%m-01', "Data") AS "Data", "Tipo", "Contrato", "Evento",
+                   COUNT(*) AS "Qtd Ações",
+                   COALESCE(SUM("Pessoas Impactadas"), 0) AS "Total Pessoas",
+                   COUNT("Pessoas Impactadas") AS "Qtd Pessoas"
+            FROM acoes{where}
+            GROUP BY 1, 2, 3, 4
+        """, conexao, params=parametros)
+
+    # Mesmas colunas de mês e tipos categóricos do cubo em memória
+    return processar_dados(cubo)[DIMENSOES_CUBO + MEDIDAS_CUBO]
+
+
+@st.cache_resource(max_entries=64)
+def consultar_contagens_banco(versao, filtros, coluna):
+    """Facetas calculadas pelo banco: ações por valor da coluna sob os filtros das demais"""
+    where, parametros = clausula_filtros(filtros, ignorar=coluna)
+
+    with conectar_banco() as conexao:
+        contagem = pd.read_sql_query(
+            f'SELECT "{coluna}", COUNT(*) AS "Qtd Ações" FROM acoes{where} GROUP BY 1 ORDER BY 1',
+            conexao, params=parametros
+        )
+
+    return contagem.set_index(coluna)['Qtd Ações'].astype(np.int64)
+
+
+@st.cache_resource(max_entries=4)
+def consultar_serie_banco(versao):
+    """Série temporal montada sobre os agregados diários por (Contrato, Tipo) calculados pelo banco"""
+    with conectar_banco() as conexao:
+        diario = pd.read_sql_query("""
+            SELECT date("Data") AS "Data", "Contrato", "Tipo",
+                   COUNT(*) AS "Qtd Ações",
+                   COALESCE(SUM("Pessoas Impactadas"), 0) AS "Total Pessoas",
+                   COUNT("Pessoas Impactadas") AS "Qtd Pessoas"
+            FROM acoes
+            GROUP BY 1, 2, 3
+        """, conexao)
+
+    return construir_serie_temporal(diario.assign(Data=pd.to_datetime(diario['Data'])))
+
+
+@st.cache_resource(max_entries=4)
+def obter_motor_cubo_banco(versao):
+    """Motor do cubo mensal do banco; bordas do período, seleções fora do cubo e facetas viram consultas"""
+    return MotorCubo(
+        consultar_cubo_banco(versao, (None, None, ())),
+        agregar=lambda filtros: consultar_cubo_banco(versao, filtros),
+        contar=lambda filtros, coluna: consultar_contagens_banco(versao, filtros, coluna),
+    )
+
+
+@st.cache_resource(max_entries=32)
+def consultar_regional_banco(versao, filtros):
+    """Medidas do cubo por (Contrato, Colaborador) calculadas pelo banco, para a aba regional"""
+    where, parametros = clausula_filtros(filtros)
+
+    with conectar_banco() as conexao:
+        return pd.read_sql_query(f"""
+            SELECT "Contrato", "Colaborador",
+                   COUNT(*) AS "Qtd Ações",
+                   COALESCE(SUM("Pessoas Impactadas"), 0) AS "Total Pessoas",
+                   COUNT("Pessoas Impactadas") AS "Qtd Pessoas"
+            FROM acoes{where}
+            GROUP BY 1, 2
+        """, conexao, params=parametros)
+
+
+@st.cache_resource(max_entries=64)
+def consultar_detalhes_banco(versao, filtros):
+    """Contagens do cabeçalho da aba de dados calculadas pelo banco (as linhas ficam no banco)"""
+    where, parametros = clausula_filtros(filtros)
+
+    with conectar_banco() as conexao:
+        registros, tipos, eventos, colaboradores = conexao.execute(f"""
+            SELECT COUNT(*), COUNT(DISTINCT "Tipo"), COUNT(DISTINCT "Evento"), COUNT(DISTINCT "Colaborador")
+            FROM acoes{where}
+        """, parametros).fetchone()
+
+    return DadosDetalhados(
+        posicoes=None, registros=registros, tipos=tipos, eventos=eventos, colaboradores=colaboradores
+    )
+
+
+# Grades sobre o banco: pesquisa, faixa e ordenação viram WHERE e ORDER BY, e só a página
+# exibida (LIMIT/OFFSET) é lida. Uma grade é (filtros, restrição, pesquisas, faixa de pessoas),
+# com a restrição (coluna, valor) opcional e as pesquisas como pares (coluna, texto).
+EXPRESSOES_BUSCA = {
+    coluna: f"strftime('%d/%m/%Y', \"{coluna}\")" if coluna == 'Data' else f'normalizar("{coluna}")'
+    for coluna in COLUNAS_EXIBICAO
+}
+# Separador que não aparece em texto digitado evita casar termos entre colunas (como no índice em memória)
+EXPRESSOES_BUSCA['Todas as colunas'] = ' || char(31) || '.join(EXPRESSOES_BUSCA.values())
+
+
+def clausula_grade(grade):
+    """WHERE parametrizado de uma grade: filtros, restrição, termos de cada pesquisa (E lógico) e faixa"""
+    filtros, restricao, pesquisas, (minimo, maximo) = grade
+    where, parametros = clausula_filtros(filtros)
+    condicoes = []
+
+    if restricao is not None:
+        condicoes.append(f'"{restricao[0]}" = ?')
+        parametros.append(restricao[1])
+
+    for coluna, texto in pesquisas:
+        for termo in normalizar_texto(texto).split():
+            condicoes.append(f'instr({EXPRESSOES_BUSCA[coluna]}, ?) > 0')
+            parametros.append(termo)
+
+    if minimo is not None:
+        condicoes.append('"Pessoas Impactadas" >= ?')
+        parametros.append(minimo)
+    if maximo is not None:
+        condicoes.append('"Pessoas Impactadas" <= ?')
+        parametros.append(maximo)
+
+    if condicoes:
+        where += (' AND ' if where else ' WHERE ') + ' AND '.join(condicoes)
+    return where, parametros
+
+
+def clausula_ordem(coluna, decrescente):
+    """ORDER BY equivalente a ordenar_posicoes sobre as linhas em ordem de data"""
+    if coluna == 'Data':
+        return ' ORDER BY "Data" DESC, rowid DESC' if decrescente else ' ORDER BY "Data", rowid'
+    # Empates continuam em ordem de data, também na ordem decrescente
+    return f' ORDER BY "{coluna}"{" DESC" if decrescente else ""}, "Data", rowid'
+
+
+def converter_linhas_banco(versao, linhas):
+    """Data como datetime e pessoas no tipo que compactar_tipos daria à base inteira"""
+    inteiras = consultar_resumo_banco(versao)['pessoas_ausentes'] == 0
+    return linhas.assign(**{
+        'Data': pd.to_datetime(linhas['Data']),
+        'Pessoas Impactadas': linhas['Pessoas Impactadas'].astype(np.int32 if inteiras else 'float64'),
+    })
+
+
+def consultar_comunidade_banco(versao, filtros):
+    """Data, evento e pessoas das ações comunitárias sob os filtros (KPIs e timeline da aba 4)"""
+    where, parametros = clausula_grade((filtros, ('Tipo', 'Comunidade'), (), (None, None)))
+
+    with conectar_banco() as conexao:
+        linhas = pd.read_sql_query(
+            f'SELECT "Data", "Evento", "Pessoas Impactadas" FROM acoes{where} ORDER BY "Data", rowid',
+            conexao, params=parametros
+        )
+
+    return converter_linhas_banco(versao, linhas)
+
+
+@st.cache_data(max_entries=64)
+def contar_grade_banco(versao, grade):
+    """Quantidade de linhas de uma grade no banco"""
+    where, parametros = clausula_grade(grade)
+
+    with conectar_banco() as conexao:
+        return conexao.execute(f'SELECT COUNT(*) FROM acoes{where}', parametros).fetchone()[0]
+
+
+def consultar_pagina_banco(versao, grade, ordem, inicio, fim):
+    """Linhas [inicio, fim) de uma grade no banco, com as colunas de exibição"""
+    where, parametros = clausula_grade(grade)
+    colunas = ', '.join(f'"{coluna}"' for coluna in COLUNAS_EXIBICAO)
+
+    with conectar_banco() as conexao:
+        pagina = pd.read_sql_query(
+            f'SELECT {colunas} FROM acoes{where}{clausula_ordem(*ordem)} LIMIT ? OFFSET ?',
+            conexao, params=parametros + [fim - inicio, inicio]
+        )
+
+    return converter_linhas_banco(versao, pagina)
+
+
+def blocos_banco(versao, grade, ordem):
+    """Todas as linhas de uma grade no banco, lidas em blocos de TAMANHO_BLOCO_EXPORTACAO (exportação)"""
+    where, parametros = clausula_grade(grade)
+    colunas = ', '.join(f'"{coluna}"' for coluna in COLUNAS_EXIBICAO)
+
+    with conectar_banco() as conexao:
+        for bloco in pd.read_sql_query(
+            f'SELECT {colunas} FROM acoes{where}{clausula_ordem(*ordem)}',
+            conexao, params=parametros, chunksize=TAMANHO_BLOCO_EXPORTACAO
+        ):
+            yield converter_linhas_banco(versao, bloco)
+
+
+@st.cache_resource(max_entries=8)
+def obter_cubo(chave, _df):
+    """Cubo de agregados calculado uma vez por planilha (ver analitico.calcular_cubo)"""
+    return calcular_cubo(_df)
+
+
+def controles_paginacao(total_linhas, prefixo, opcoes_tamanho=(10, 25, 50)):
+    """Seletores de tamanho e número de página; retorna o intervalo (início, fim) da página"""
+    chave_pagina = f"{prefixo}_pagina"
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+
+    with col1:
+        tamanho = st.selectbox("Itens por página", opcoes_tamanho, key=f"{prefixo}_tamanho")
+
+    total_paginas = max(1, -(-total_linhas // tamanho))
+
+    # Filtros podem reduzir o total de páginas abaixo da página guardada
+    if st.session_state.get(chave_pagina, 1) > total_paginas:
+        st.session_state[chave_pagina] = total_paginas
+
+    with col2:
+        pagina = st.number_input("Página", min_value=1, max_value=total_paginas, step=1, key=chave_pagina)
+
+    inicio = (pagina - 1) * tamanho
+    fim = min(inicio + tamanho, total_linhas)
+
+    with col3:
+        st.caption(f"Exibindo {inicio + 1 if total_linhas else 0}–{fim} de {total_linhas} · {total_paginas} página(s)")
+
+    return inicio, fim
+
+
+@st.cache_resource(max_entries=8)
+def obter_serie_temporal(chave, _dados):
+    """Série temporal diária/mensal montada uma vez por planilha (a partir das linhas)"""
+    return construir_serie_temporal(_dados)
+
+
+@st.cache_resource(max_entries=8)
+def obter_indice_busca(chave, _df):
+    """Índice de pesquisa montado uma vez por planilha"""
+    return construir_indice_busca(_df)
+
+
+@st.cache_resource(max_entries=32)
+def obter_chave_ordenacao(chave, coluna, _df):
+    """Chave de ordenação de uma coluna calculada uma vez por planilha"""
+    return chave_ordenacao(_df[coluna])
+
+
+@st.cache_resource(max_entries=16)
+def obter_motor_filtros(chave, _dados, coluna_peso=None):
+    """Motor de filtros de um conjunto de dados, reaproveitado entre reruns e sessões"""
+    return MotorFiltros(_dados, coluna_peso)
+
+
+@st.cache_resource(max_entries=8)
+def obter_motor_cubo(chave, _cubo, _df):
+    """Motor do cubo mensal de uma base em memória (bordas do período resolvidas nas linhas)"""
+    return motor_cubo_linhas(_cubo, obter_motor_filtros(chave, _df))
+
+
+def preparar_exportacao(blocos, formato):
+    """Grava em disco a exportação dos blocos de linhas e retorna o caminho do arquivo"""
+    extensao, _, exportar = FORMATOS_EXPORTACAO[formato]
+    os.makedirs(PASTA_EXPORTACOES, exist_ok=True)
+
+    # Exportações abandonadas (sessões encerradas antes do download) são removidas depois de um tempo
+    limite = time.time() - VALIDADE_EXPORTACAO_S
+    for nome in os.listdir(PASTA_EXPORTACOES):
+        antigo = os.path.join(PASTA_EXPORTACOES, nome)
         try:
-            locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil.1252')
-        except:
+            if os.path.getmtime(antigo) < limite:
+                os.remove(antigo)
+        except OSError:
             pass
 
-    # Converter data para datetime
-    df['Data'] = pd.to_datetime(df['Data'])
-    df['Mês'] = df['Data'].dt.to_period('M')
-    df['Mês_Ordenacao'] = df['Data'].dt.to_period('M').astype(str)
-
-    # Tradução manual dos meses para garantir que funcione
-    meses_pt = {
-        1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
-        5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
-        9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+    descritor, caminho = tempfile.mkstemp(suffix=f".{extensao}", dir=PASTA_EXPORTACOES)
+    os.close(descritor)
+    try:
+        exportar(blocos, caminho)
+    except Exception:
+        os.remove(caminho)
+        raise
+    return caminho
+
+
+def descartar_exportacao():
+    """Remove o arquivo da exportação preparada na execução anterior desta sessão"""
+    exportacao = st.session_state.pop('exportacao', None)
+    if exportacao is not None and os.path.exists(exportacao['caminho']):
+        os.remove(exportacao['caminho'])
+
+
+def opcoes_faceta(contagem, selecionados):
+    """Opções de um filtro: valores com ações sob as demais seleções, mais os já selecionados"""
+    opcoes = list(contagem.index[contagem > 0])
+    # Um valor selecionado que ficou sem ações (ou fora da contagem) continua na lista para poder ser removido
+    return opcoes + [valor for valor in selecionados if valor not in opcoes]
+
+
+def resumir_facetas(contagem, selecionados, limite=4):
+    """Texto curto com as contagens das opções selecionadas (ou das maiores)"""
+    if selecionados:
+        # Facetas do banco só trazem os valores com ações
+        itens = contagem.reindex(selecionados, fill_value=0)
+    else:
+        itens = contagem[contagem > 0].sort_values(ascending=False, kind='stable')
+
+    texto = ' · '.join(f"{valor}: {quantidade}" for valor, quantidade in itens.head(limite).items())
+    if len(itens) > limite:
+        texto += f" · +{len(itens) - limite}"
+    return texto or "Nenhuma ação com os filtros atuais"
+
+
+# Pré-cálculo das abas
+# Consolidações e figuras de cada aba são calculadas no pool de threads assim que os
+# filtros são aplicados; as abas recebem Futures e renderizam quando o seu fica pronto.
+@st.cache_resource
+def obter_executor():
+    """Pool de threads compartilhado entre sessões (None calcula na thread do script)"""
+    if TRABALHADORES_ABAS < 1:
+        return None
+    return ThreadPoolExecutor(max_workers=TRABALHADORES_ABAS, thread_name_prefix="sesmt-abas")
+
+
+def agendar(funcao, *args):
+    """Executa a função no pool, com o contexto da execução atual, e retorna um Future"""
+    executor = obter_executor()
+    if executor is None:
+        futuro = Future()
+        try:
+            futuro.set_result(funcao(*args))
+        except Exception as erro:
+            futuro.set_exception(erro)
+        return futuro
+
+    # Com o contexto da execução, medir() e os caches do Streamlit funcionam na thread do pool
+    contexto = get_script_run_ctx()
+
+    def executar():
+        add_script_run_ctx(threading.current_thread(), contexto)
+        return funcao(*args)
+
+    return executor.submit(executar)
+
+
+@cronometrado("cálculo: Visão Geral")
+def calcular_visao_geral(cubo, cubo_filtrado, serie, motor_cubo, filtros):
+    """KPIs, indicadores de período, evolução mensal e distribuição por tipo com as figuras da aba 1"""
+    indicadores = indicadores_mensais(serie, mensal_dos_filtros(serie, motor_cubo, filtros), filtros)
+    resumo = resumir_visao_geral(cubo, cubo_filtrado, indicadores)
+    return resumo, figuras_visao_geral(resumo, obter_figura)
+
+
+@cronometrado("cálculo: Análise por Categoria")
+def calcular_categorias(cubo_filtrado):
+    """Rankings de eventos e tabela resumo com as figuras da aba 2"""
+    resumo = resumir_categorias(cubo_filtrado)
+    return resumo, figuras_categorias(resumo, obter_figura)
+
+
+# No banco (df None) as consolidações vêm de consultas e a chave da base é a versão do banco.
+@cronometrado("cálculo: Análise Regional")
+def calcular_regional(cubo_filtrado, chave, df, filtros, indexador):
+    """Totais por região e por colaborador com as figuras da aba 3"""
+    if df is None:
+        por_colaborador = consultar_regional_banco(chave, filtros)
+    else:
+        por_colaborador = agregar_linhas(df.iloc[indexador], ['Contrato', 'Colaborador'])
+    resumo = resumir_regional(cubo_filtrado, por_colaborador)
+    return resumo, figuras_regional(resumo, obter_figura)
+
+
+@cronometrado("cálculo: Ações Comunitárias")
+def calcular_comunidade(chave, df, filtros, motor, indexador):
+    """Ações comunitárias e timeline da aba 4 (sem figura quando não há ações)"""
+    if df is None:
+        linhas = consultar_comunidade_banco(chave, filtros)
+    else:
+        linhas = df.iloc[motor.restringir(indexador, 'Tipo', 'Comunidade')]
+    resumo = resumir_comunidade(linhas)
+    return resumo, figura_comunidade(resumo, obter_figura)
+
+
+@cronometrado("cálculo: Dados Detalhados")
+def calcular_dados(chave, df, filtros, indexador):
+    """Linhas filtradas e contagens da aba 5"""
+    if df is None:
+        return consultar_detalhes_banco(chave, filtros)
+    return montar_dados_detalhados(df, indexador)
+
+
+def agendar_abas(cubo, cubo_filtrado, serie, motor_cubo, filtros, chave, df, motor, indexador):
+    """Envia ao pool o cálculo de cada aba; retorna {aba: Future}"""
+    return {
+        'visao_geral': agendar(calcular_visao_geral, cubo, cubo_filtrado, serie, motor_cubo, filtros),
+        'categorias': agendar(calcular_categorias, cubo_filtrado),
+        'regional': agendar(calcular_regional, cubo_filtrado, chave, df, filtros, indexador),
+        'comunidade': agendar(calcular_comunidade, chave, df, filtros, motor, indexador),
+        'dados': agendar(calcular_dados, chave, df, filtros, indexador),
     }
 
-    df['Mês_Nome'] = df['Data'].dt.month.map(meses_pt) + '/' + df['Data'].dt.year.astype(str)
 
-    return df
+# Abas do dashboard
+# Cada aba é um fragmento: interações com seus widgets reexecutam só a própria aba,
+# usando os dados recebidos como argumentos na última execução completa da página.
+@st.fragment
+@cronometrado("painel de filtros")
+def painel_filtros(motor_cubo, min_date, max_date):
+    """Filtros da sidebar; grava o estado em st.session_state['filtros']
+
+    Como fragmento, mexer nos filtros atualiza só o painel (contagens das
+    facetas) e a página inteira é reexecutada apenas quando o estado dos
+    filtros de fato muda.
+    """
+    # Filtro de período
+    date_range = st.date_input(
+        "Período",
+        value=(min_date, max_date),
+        min_value=min_date,
+        max_value=max_date
+    )
 
+    # Filtros multisseleção: vazio = todos. Filtros hierárquicos: cada lista só
+    # oferece os valores com ações no período e nas seleções atuais das demais
+    # dimensões. (As contagens ficam fora dos rótulos das opções.)
+    selecoes_atuais = {
+        coluna: st.session_state.get(f"filtro_{coluna}", []) for coluna in FILTROS_DIMENSAO
+    }
+    filtros_atuais = montar_filtros(date_range, selecoes_atuais)
+
+    selecoes = {}
+    for coluna, rotulo in FILTROS_DIMENSAO.items():
+        contagem = motor_cubo.contagens(filtros_atuais, coluna)
+        # Mudar a lista de opções recria o widget; regravar a seleção no estado a preserva
+        chave = f"filtro_{coluna}"
+        if chave in st.session_state:
+            st.session_state[chave] = selecoes_atuais[coluna]
+        selecoes[coluna] = st.multiselect(
+            rotulo,
+            opcoes_faceta(contagem, selecoes_atuais[coluna]),
+            key=chave,
+            placeholder="Todos"
+        )
+        st.caption(resumir_facetas(contagem, selecoes[coluna]))
+
+    filtros = montar_filtros(date_range, selecoes)
+
+    # Intervalo incompleto (só a data inicial escolhida) mantém o período aplicado
+    if len(date_range) != 2 and 'filtros' in st.session_state:
+        filtros = (*st.session_state['filtros'][:2], filtros[2])
+
+    if st.session_state.get('filtros') != filtros:
+        st.session_state['filtros'] = filtros
+
+        # Numa reexecução só do fragmento, as abas dependem do novo estado
+        if not st.session_state.get('execucao_completa'):
+            st.rerun()
+
+
+@st.fragment
+@cronometrado("aba: Visão Geral")
+def aba_visao_geral(calculo):
+    """Aba 1 - Visão Geral: KPIs e evolução mensal a partir do cubo"""
+    resumo, (fig1, fig2, fig3, fig9) = calculo.result()
+
+    # KPIs principais
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.metric(
+            "Total de Ações",
+            f"{resumo.acoes_filtradas}",
+            delta=(
+                f"{resumo.acoes_filtradas - resumo.total_acoes} ações"
+                if resumo.acoes_filtradas != resumo.total_acoes else None
+            )
+        )
 
-# Header Principal
-st.markdown(f"""
-<div class="main-title">
-    <h1>⚡ BI SESMT - Rezende Energia</h1>
-    <p>Acompanhamento de Ações de Segurança do Trabalho</p>
-</div>
-""", unsafe_allow_html=True)
+    with col2:
+        st.metric(
+            "Pessoas Impactadas",
+            f"{resumo.total_pessoas:,}".replace(',', '.')
+        )
 
-# Sidebar com upload
-with st.sidebar:
-    st.markdown("### 📤 Upload de Dados")
-    uploaded_file = st.file_uploader(
-        "Carregar planilha de acompanhamento",
-        type=['xlsx', 'xls'],
-        help="Faça upload da planilha de Acompanhamento de Ações SESMT"
-    )
+    with col3:
+        st.metric(
+            "Média de Participantes",
+            f"{resumo.media_participantes:.0f}"
+        )
 
     st.markdown("---")
-    st.markdown("### 📊 Navegação")
-    st.info("Selecione uma aba acima para visualizar diferentes análises")
+
+    # Gráficos: evolução de ações e pessoas impactadas por mês
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.plotly_chart(fig1, width='stretch')
+
+    with col2:
+        st.plotly_chart(fig2, width='stretch')
+
+    # Distribuição por tipo
+    st.markdown("### Distribuição por Tipo de Ação")
+    st.plotly_chart(fig3, width='stretch')
 
     st.markdown("---")
-    st.markdown("### ℹ️ Sobre")
-    st.markdown("**Rezende Energia**")
-    st.markdown("Sistema de Business Intelligence para monitoramento de ações do SESMT")
+    secao_indicadores(resumo.indicadores, fig9)
 
-# Verificar se há arquivo carregado
-if uploaded_file is not None:
-    # Carregar dados
-    try:
-        df = pd.read_excel(uploaded_file)
-        df = processar_dados(df)
 
-        # Sidebar - Filtros
-        with st.sidebar:
-            st.markdown("---")
-            st.markdown("### 🔍 Filtros")
+def formatar_numero(valor):
+    """Inteiro com separador de milhar brasileiro"""
+    return f"{int(valor):,}".replace(',', '.')
+
 
-            # Filtro de período
-            min_date = df['Data'].min()
-            max_date = df['Data'].max()
+def formatar_variacao(variacao, referencia):
+    """Delta de st.metric para uma variação relativa (None quando não há base de comparação)"""
+    if pd.isna(variacao):
+        return None
+    return f"{variacao:+.1%} vs {referencia}"
 
-            date_range = st.date_input(
-                "Período",
-                value=(min_date, max_date),
-                min_value=min_date,
-                max_value=max_date
+
+def secao_indicadores(indicadores, figura):
+    """Indicadores do mês de referência (último mês do período) e série mensal com janelas móveis"""
+    st.markdown("### 📅 Indicadores por Período")
+
+    if indicadores.empty:
+        st.info("Nenhum mês no período selecionado.")
+        return
+
+    atual = indicadores.iloc[-1]
+    st.caption(
+        f"Mês de referência: {atual['Mês_Nome']} (mês completo). "
+        "Janelas móveis e acumulado consideram todo o histórico até o mês de referência."
+    )
+
+    for medida, rotulo in (('Qtd Ações', 'Ações'), ('Total Pessoas', 'Pessoas')):
+        col1, col2, col3, col4, col5 = st.columns(5)
+
+        with col1:
+            st.metric(
+                f"{rotulo} no mês",
+                formatar_numero(atual[medida]),
+                delta=formatar_variacao(atual[f'{medida} Var. Mês'], "mês anterior")
             )
 
-            # Filtro de tipo
-            tipos = ['Todos'] + list(df['Tipo'].unique())
-            tipo_selecionado = st.selectbox("Tipo de Ação", tipos)
+        with col2:
+            ano_anterior = atual[f'{medida} Ano Anterior']
+            st.metric(
+                f"{rotulo} no mesmo mês do ano anterior",
+                formatar_numero(ano_anterior) if pd.notna(ano_anterior) else "—",
+                delta=formatar_variacao(atual[f'{medida} Var. Ano'], "ano anterior")
+            )
 
-            # Filtro de contrato
-            contratos = ['Todos'] + list(df['Contrato'].unique())
-            contrato_selecionado = st.selectbox("Contrato/Região", contratos)
+        with col3:
+            st.metric(f"{rotulo} nos últimos 3 meses", formatar_numero(atual[f'{medida} 3M']))
 
-            # Aplicar filtros
-            df_filtrado = df.copy()
+        with col4:
+            st.metric(f"{rotulo} nos últimos 12 meses", formatar_numero(atual[f'{medida} 12M']))
 
-            if len(date_range) == 2:
-                df_filtrado = df_filtrado[
-                    (df_filtrado['Data'] >= pd.Timestamp(date_range[0])) &
-                    (df_filtrado['Data'] <= pd.Timestamp(date_range[1]))
-                    ]
+        with col5:
+            st.metric(f"{rotulo} acumuladas", formatar_numero(atual[f'{medida} Acumulado']))
 
-            if tipo_selecionado != 'Todos':
-                df_filtrado = df_filtrado[df_filtrado['Tipo'] == tipo_selecionado]
+    st.plotly_chart(figura, width='stretch')
 
-            if contrato_selecionado != 'Todos':
-                df_filtrado = df_filtrado[df_filtrado['Contrato'] == contrato_selecionado]
+    with st.expander("Série mensal"):
+        colunas = ['Mês_Nome'] + [
+            f'{medida}{sufixo}'
+            for medida in ('Qtd Ações', 'Total Pessoas')
+            for sufixo in ('', ' Var. Mês', ' Var. Ano', ' 3M', ' 12M', ' Acumulado')
+        ]
+        st.dataframe(
+            indicadores[colunas].rename(columns={'Mês_Nome': 'Mês'}),
+            width='stretch',
+            hide_index=True,
+            column_config={
+                coluna: st.column_config.NumberColumn(format="percent")
+                for coluna in colunas if 'Var.' in coluna
+            }
+        )
 
-        # Criar tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "📊 Visão Geral",
-            "📈 Análise por Categoria",
-            "🗺️ Análise Regional",
-            "👥 Ações Comunitárias",
-            "📋 Dados Detalhados"
-        ])
 
-        # TAB 1 - VISÃO GERAL
-        with tab1:
-            # KPIs principais
-            col1, col2, col3 = st.columns(3)
-
-            with col1:
-                st.metric(
-                    "Total de Ações",
-                    f"{len(df_filtrado)}",
-                    delta=f"{len(df_filtrado) - len(df)} ações" if len(df_filtrado) != len(df) else None
-                )
+@st.fragment
+@cronometrado("aba: Análise por Categoria")
+def aba_categorias(calculo):
+    """Aba 2 - Análise por Categoria: rankings e resumo por evento"""
+    st.markdown("### 📊 Performance por Tipo de Evento")
 
-            with col2:
-                total_pessoas = df_filtrado['Pessoas Impactadas'].sum()
-                st.metric(
-                    "Pessoas Impactadas",
-                    f"{total_pessoas:,}".replace(',', '.')
-                )
+    resumo, (fig4, fig5) = calculo.result()
 
-            with col3:
-                media_participantes = df_filtrado['Pessoas Impactadas'].mean()
-                st.metric(
-                    "Média de Participantes",
-                    f"{media_participantes:.0f}"
-                )
+    col1, col2 = st.columns(2)
 
-            st.markdown("---")
+    with col1:
+        # Ranking de eventos por quantidade
+        st.plotly_chart(fig4, width='stretch')
 
-            # Gráficos
-            col1, col2 = st.columns(2)
+    with col2:
+        # Pessoas impactadas por tipo de evento
+        st.plotly_chart(fig5, width='stretch')
 
-            with col1:
-                # Evolução de ações ao longo do tempo
-                acoes_por_mes = df_filtrado.groupby(['Mês_Ordenacao', 'Mês_Nome']).size().reset_index(name='Quantidade')
-                acoes_por_mes = acoes_por_mes.sort_values('Mês_Ordenacao')
+    st.markdown("---")
+    st.markdown("### 📋 Tabela Resumo por Evento")
+
+    # Tabela dinâmica
+    st.dataframe(
+        resumo.tabela_eventos,
+        width='stretch',
+        hide_index=True,
+        height=400
+    )
 
-                fig1 = px.line(
-                    acoes_por_mes,
-                    x='Mês_Nome',
-                    y='Quantidade',
-                    title='Evolução de Ações ao Longo do Tempo',
-                    markers=True
-                )
-                fig1.update_traces(
-                    line_color=COR_SECUNDARIA,
-                    line_width=3,
-                    marker=dict(size=10, color=COR_SECUNDARIA)
-                )
-                fig1.update_layout(**criar_layout_cores())
-                st.plotly_chart(fig1, use_container_width=True)
-
-            with col2:
-                # Pessoas impactadas por mês
-                pessoas_por_mes = df_filtrado.groupby(['Mês_Ordenacao', 'Mês_Nome'])[
-                    'Pessoas Impactadas'].sum().reset_index()
-                pessoas_por_mes = pessoas_por_mes.sort_values('Mês_Ordenacao')
-
-                fig2 = px.bar(
-                    pessoas_por_mes,
-                    x='Mês_Nome',
-                    y='Pessoas Impactadas',
-                    title='Pessoas Impactadas por Mês',
-                    color_discrete_sequence=[COR_SECUNDARIA]
-                )
-                fig2.update_layout(**criar_layout_cores())
-                st.plotly_chart(fig2, use_container_width=True)
-
-            # Distribuição por tipo
-            st.markdown("### Distribuição por Tipo de Ação")
-            tipo_dist = df_filtrado['Tipo'].value_counts().reset_index()
-            tipo_dist.columns = ['Tipo', 'Quantidade']
-
-            fig3 = px.pie(
-                tipo_dist,
-                values='Quantidade',
-                names='Tipo',
-                title='Distribuição de Ações por Tipo',
-                color_discrete_sequence=[COR_SECUNDARIA, '#ff9d3d', '#ffb366', '#ffc999']
-            )
-            fig3.update_layout(**criar_layout_cores())
-            fig3.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig3, use_container_width=True)
 
-        # TAB 2 - ANÁLISE POR CATEGORIA
-        with tab2:
-            st.markdown("### 📊 Performance por Tipo de Evento")
-
-            col1, col2 = st.columns(2)
-
-            with col1:
-                # Ranking de eventos por quantidade
-                eventos_ranking = df_filtrado['Evento'].value_counts().reset_index()
-                eventos_ranking.columns = ['Evento', 'Quantidade']
-                eventos_ranking = eventos_ranking.head(10)
-
-                fig4 = px.bar(
-                    eventos_ranking,
-                    y='Evento',
-                    x='Quantidade',
-                    orientation='h',
-                    title='Top 10 Eventos Mais Realizados',
-                    color='Quantidade',
-                    color_continuous_scale=[[0, COR_PRINCIPAL], [1, COR_SECUNDARIA]]
-                )
-                fig4.update_layout(**criar_layout_cores())
-                st.plotly_chart(fig4, use_container_width=True)
-
-            with col2:
-                # Pessoas impactadas por tipo de evento
-                pessoas_por_evento = df_filtrado.groupby('Evento')['Pessoas Impactadas'].sum().reset_index()
-                pessoas_por_evento = pessoas_por_evento.sort_values('Pessoas Impactadas', ascending=False).head(10)
-
-                fig5 = px.bar(
-                    pessoas_por_evento,
-                    y='Evento',
-                    x='Pessoas Impactadas',
-                    orientation='h',
-                    title='Top 10 Eventos com Maior Alcance',
-                    color='Pessoas Impactadas',
-                    color_continuous_scale=[[0, COR_PRINCIPAL], [1, COR_SECUNDARIA]]
-                )
-                fig5.update_layout(**criar_layout_cores())
-                st.plotly_chart(fig5, use_container_width=True)
+@st.fragment
+@cronometrado("aba: Análise Regional")
+def aba_regional(calculo):
+    """Aba 3 - Análise Regional: cards, gráficos e tabela por colaborador"""
+    st.markdown("### 🗺️ Comparativo Regional")
 
-            st.markdown("---")
-            st.markdown("### 📋 Tabela Resumo por Evento")
+    # Consolidação por região usada pelos cards e pelos gráficos
+    resumo, (fig6, fig7) = calculo.result()
+    resumo_regiao = resumo.por_contrato
 
-            # Tabela dinâmica
-            tabela_eventos = df_filtrado.groupby('Evento').agg({
-                'Pessoas Impactadas': ['sum', 'mean', 'count']
-            }).round(1)
-            tabela_eventos.columns = ['Total Pessoas', 'Média Pessoas', 'Qtd Ações']
-            tabela_eventos = tabela_eventos.sort_values('Total Pessoas', ascending=False)
-            tabela_eventos = tabela_eventos.reset_index()
+    col1, col2, col3 = st.columns(3)
 
-            st.dataframe(
-                tabela_eventos,
-                use_container_width=True,
-                hide_index=True,
-                height=400
-            )
+    cards_regiao = zip(resumo_regiao['Contrato'], resumo_regiao['Qtd Ações'], resumo_regiao['Total Pessoas'])
 
-        # TAB 3 - ANÁLISE REGIONAL
-        with tab3:
-            st.markdown("### 🗺️ Comparativo Regional")
+    for idx, (contrato, acoes_contrato, pessoas_contrato) in enumerate(cards_regiao):
+        with [col1, col2, col3][idx % 3]:
+            st.markdown(f"""
+            <div style='background: linear-gradient(135deg, {COR_PRINCIPAL} 0%, #333333 100%); 
+                        padding: 20px; border-radius: 10px; color: white; text-align: center;'>
+                <h2 style='color: {COR_SECUNDARIA}; margin: 0;'>{contrato}</h2>
+                <p style='font-size: 1.2rem; margin: 10px 0;'><b>{acoes_contrato}</b> ações</p>
+                <p style='font-size: 1.2rem; margin: 10px 0;'><b>{pessoas_contrato:,}</b> pessoas</p>
+            </div>
+            """.replace(',', '.'), unsafe_allow_html=True)
 
-            col1, col2, col3 = st.columns(3)
+    st.markdown("---")
 
-            contratos = df_filtrado['Contrato'].unique()
+    col1, col2 = st.columns(2)
 
-            for idx, contrato in enumerate(contratos):
-                with [col1, col2, col3][idx % 3]:
-                    df_contrato = df_filtrado[df_filtrado['Contrato'] == contrato]
-                    acoes_contrato = len(df_contrato)
-                    pessoas_contrato = df_contrato['Pessoas Impactadas'].sum()
+    with col1:
+        # Ações por região
+        st.plotly_chart(fig6, width='stretch')
 
-                    st.markdown(f"""
-                    <div style='background: linear-gradient(135deg, {COR_PRINCIPAL} 0%, #333333 100%); 
-                                padding: 20px; border-radius: 10px; color: white; text-align: center;'>
-                        <h2 style='color: {COR_SECUNDARIA}; margin: 0;'>{contrato}</h2>
-                        <p style='font-size: 1.2rem; margin: 10px 0;'><b>{acoes_contrato}</b> ações</p>
-                        <p style='font-size: 1.2rem; margin: 10px 0;'><b>{pessoas_contrato:,}</b> pessoas</p>
-                    </div>
-                    """.replace(',', '.'), unsafe_allow_html=True)
+    with col2:
+        # Pessoas impactadas por região
+        st.plotly_chart(fig7, width='stretch')
 
-            st.markdown("---")
+    # Análise por colaborador e região
+    st.markdown("### 👥 Performance por Colaborador e Região")
 
-            col1, col2 = st.columns(2)
-
-            with col1:
-                # Ações por região
-                acoes_regiao = df_filtrado.groupby('Contrato').size().reset_index(name='Quantidade')
-                fig6 = px.bar(
-                    acoes_regiao,
-                    x='Contrato',
-                    y='Quantidade',
-                    title='Ações Realizadas por Região',
-                    color='Quantidade',
-                    color_continuous_scale=[[0, COR_PRINCIPAL], [1, COR_SECUNDARIA]]
-                )
-                fig6.update_layout(**criar_layout_cores())
-                st.plotly_chart(fig6, use_container_width=True)
-
-            with col2:
-                # Pessoas impactadas por região
-                pessoas_regiao = df_filtrado.groupby('Contrato')['Pessoas Impactadas'].sum().reset_index()
-                fig7 = px.bar(
-                    pessoas_regiao,
-                    x='Contrato',
-                    y='Pessoas Impactadas',
-                    title='Pessoas Impactadas por Região',
-                    color='Pessoas Impactadas',
-                    color_continuous_scale=[[0, COR_PRINCIPAL], [1, COR_SECUNDARIA]]
-                )
-                fig7.update_layout(**criar_layout_cores())
-                st.plotly_chart(fig7, use_container_width=True)
+    st.dataframe(
+        resumo.tabela_colaborador,
+        width='stretch',
+        hide_index=True
+    )
 
-            # Análise por colaborador e região
-            st.markdown("### 👥 Performance por Colaborador e Região")
 
-            tabela_colaborador = df_filtrado.groupby(['Contrato', 'Colaborador']).agg({
-                'Pessoas Impactadas': 'sum',
-                'Evento': 'count'
-            }).round(1)
-            tabela_colaborador.columns = ['Total Pessoas', 'Qtd Ações']
-            tabela_colaborador = tabela_colaborador.sort_values('Total Pessoas', ascending=False)
-            tabela_colaborador = tabela_colaborador.reset_index()
+@st.fragment
+@cronometrado("aba: Ações Comunitárias")
+def aba_comunidade(chave, df, filtros, calculo):
+    """Aba 4 - Ações Comunitárias: KPIs, timeline e detalhes paginados (no banco, consultados por página)"""
+    st.markdown("### 🤝 Impacto Comunitário")
 
-            st.dataframe(
-                tabela_colaborador,
-                use_container_width=True,
-                hide_index=True
+    # Ações comunitárias (já ordenadas por Data) e timeline calculadas no pool
+    resumo, fig8 = calculo.result()
+    df_comunidade = resumo.linhas
+
+    if resumo.acoes > 0:
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.metric(
+                "Ações Comunitárias",
+                f"{resumo.acoes}"
             )
 
-        # TAB 4 - AÇÕES COMUNITÁRIAS
-        with tab4:
-            st.markdown("### 🤝 Impacto Comunitário")
+        with col2:
+            st.metric(
+                "Pessoas da Comunidade",
+                f"{resumo.pessoas:,}".replace(',', '.')
+            )
+
+        with col3:
+            st.metric(
+                "Média por Ação",
+                f"{resumo.media_pessoas:.0f}"
+            )
+
+        st.markdown("---")
+
+        # Timeline de campanhas
+        st.markdown("### 📅 Timeline de Ações Comunitárias")
+
+        st.plotly_chart(fig8, width='stretch')
 
-            # Filtrar apenas ações comunitárias
-            df_comunidade = df_filtrado[df_filtrado['Tipo'] == 'Comunidade']
+        st.markdown("---")
 
-            if len(df_comunidade) > 0:
-                col1, col2, col3 = st.columns(3)
+        # Detalhes das ações comunitárias: só a página atual vira elementos na tela
+        st.markdown("### 📋 Detalhes das Ações Comunitárias")
+
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            filtro_detalhes = st.text_input(
+                "Filtrar ações comunitárias",
+                "",
+                key="comunidade_filtro",
+                placeholder="Evento, responsável, observações..."
+            )
+
+        with col2:
+            ordem_detalhes = st.selectbox("Ordenar por", list(ORDENS_COMUNIDADE), key="comunidade_ordem")
+
+        if df is None:
+            pesquisas = (('Todas as colunas', filtro_detalhes),) if filtro_detalhes.strip() else ()
+            grade = (filtros, ('Tipo', 'Comunidade'), pesquisas, (None, None))
+            total = contar_grade_banco(chave, grade)
+        else:
+            df_detalhes = df_comunidade
+            if filtro_detalhes.strip():
+                indice_busca = obter_indice_busca(chave, df)
+                df_detalhes = df_detalhes[pesquisar(indice_busca, df_detalhes.index, filtro_detalhes)]
+
+            if ordem_detalhes == 'Data (mais recentes)':
+                df_detalhes = df_detalhes.iloc[::-1]
+            elif ordem_detalhes == 'Pessoas Impactadas':
+                df_detalhes = df_detalhes.sort_values('Pessoas Impactadas', ascending=False, kind='stable')
+            total = len(df_detalhes)
+
+        inicio, fim = controles_paginacao(total, "comunidade")
+
+        if df is None:
+            pagina = consultar_pagina_banco(chave, grade, ORDENS_COMUNIDADE[ordem_detalhes], inicio, fim)
+        else:
+            pagina = df_detalhes.iloc[inicio:fim]
+
+        for idx, row in pagina.iterrows():
+            with st.expander(f"📍 {row['Data'].strftime('%d/%m/%Y')} - {row['Evento']}"):
+                col1, col2 = st.columns([2, 1])
 
                 with col1:
-                    st.metric(
-                        "Ações Comunitárias",
-                        f"{len(df_comunidade)}"
-                    )
+                    st.markdown(f"**Observações:**")
+                    st.write(row['Observações'])
 
                 with col2:
-                    st.metric(
-                        "Pessoas da Comunidade",
-                        f"{df_comunidade['Pessoas Impactadas'].sum():,}".replace(',', '.')
-                    )
+                    st.markdown(f"**Pessoas Impactadas:** {row['Pessoas Impactadas']}")
+                    st.markdown(f"**Responsável:** {row['Colaborador']}")
+                    st.markdown(f"**Região:** {row['Contrato']}")
+    else:
+        st.info("Nenhuma ação comunitária encontrada no período selecionado.")
 
-                with col3:
-                    st.metric(
-                        "Média por Ação",
-                        f"{df_comunidade['Pessoas Impactadas'].mean():.0f}"
-                    )
 
-                st.markdown("---")
-
-                # Timeline de campanhas
-                st.markdown("### 📅 Timeline de Ações Comunitárias")
-
-                df_comunidade_sorted = df_comunidade.sort_values('Data')
-
-                fig8 = go.Figure()
-
-                for idx, row in df_comunidade_sorted.iterrows():
-                    fig8.add_trace(go.Scatter(
-                        x=[row['Data']],
-                        y=[row['Pessoas Impactadas']],
-                        mode='markers+text',
-                        marker=dict(size=15, color=COR_SECUNDARIA),
-                        text=[row['Evento'][:30] + '...'],
-                        textposition='top center',
-                        name=row['Evento'],
-                        hovertemplate=f"<b>{row['Evento']}</b><br>" +
-                                      f"Data: {row['Data'].strftime('%d/%m/%Y')}<br>" +
-                                      f"Pessoas: {row['Pessoas Impactadas']}<br>" +
-                                      "<extra></extra>"
-                    ))
-
-                fig8.update_layout(
-                    title='Timeline de Ações Comunitárias',
-                    xaxis_title='Data',
-                    yaxis_title='Pessoas Impactadas',
-                    showlegend=False,
-                    **criar_layout_cores()
-                )
-                st.plotly_chart(fig8, use_container_width=True)
+@st.fragment
+@cronometrado("aba: Dados Detalhados")
+def aba_dados(chave, df, filtros, calculo):
+    """Aba 5 - Dados Detalhados: grade paginada no servidor, pesquisa e download
 
-                st.markdown("---")
+    Pesquisa, filtros por coluna e ordenação operam sobre posições de linhas;
+    só a página visível é formatada e enviada ao navegador. No banco (df None)
+    a grade vira uma consulta e só a página visível é lida, com LIMIT/OFFSET.
+    """
+    st.markdown("### 📋 Tabela Completa de Ações")
 
-                # Detalhes das ações comunitárias
-                st.markdown("### 📋 Detalhes das Ações Comunitárias")
+    # Posições das linhas filtradas e contagens preparadas no pool
+    detalhes = calculo.result()
+    posicoes = detalhes.posicoes
 
-                for idx, row in df_comunidade_sorted.iterrows():
-                    with st.expander(f"📍 {row['Data'].strftime('%d/%m/%Y')} - {row['Evento']}"):
-                        col1, col2 = st.columns([2, 1])
+    # Mostrar estatísticas
+    col1, col2, col3, col4 = st.columns(4)
 
-                        with col1:
-                            st.markdown(f"**Observações:**")
-                            st.write(row['Observações'])
+    with col1:
+        st.metric("Total de Registros", detalhes.registros)
 
-                        with col2:
-                            st.markdown(f"**Pessoas Impactadas:** {row['Pessoas Impactadas']}")
-                            st.markdown(f"**Responsável:** {row['Colaborador']}")
-                            st.markdown(f"**Região:** {row['Contrato']}")
+    with col2:
+        st.metric("Tipos Diferentes", detalhes.tipos)
+
+    with col3:
+        st.metric("Eventos Diferentes", detalhes.eventos)
+
+    with col4:
+        st.metric("Colaboradores", detalhes.colaboradores)
+
+    st.markdown("---")
+
+    # Barra de pesquisa sobre o índice de texto normalizado da planilha
+    col1, col2 = st.columns([3, 1])
+
+    with col1:
+        search = st.text_input(
+            "🔍 Pesquisar na tabela",
+            "",
+            help="Todos os termos precisam aparecer; acentos e maiúsculas são ignorados"
+        )
+
+    with col2:
+        coluna_busca = st.selectbox("Pesquisar em", ['Todas as colunas'] + COLUNAS_EXIBICAO)
+
+    # Filtros por coluna (texto contido, sem acentos) e faixa de pessoas impactadas
+    with st.expander("Filtros por coluna"):
+        colunas_filtro = st.columns(len(COLUNAS_FILTRO_GRADE))
+        filtros_coluna = {
+            coluna: campo.text_input(coluna, "", key=f"grade_filtro_{coluna}")
+            for coluna, campo in zip(COLUNAS_FILTRO_GRADE, colunas_filtro)
+        }
+
+        col1, col2 = st.columns(2)
+        with col1:
+            pessoas_min = st.number_input("Pessoas Impactadas (mínimo)", min_value=0, value=None, key="grade_pessoas_min")
+        with col2:
+            pessoas_max = st.number_input("Pessoas Impactadas (máximo)", min_value=0, value=None, key="grade_pessoas_max")
+
+    consultas = [(coluna_busca, search)] + list(filtros_coluna.items())
+    consultas = tuple((coluna, texto) for coluna, texto in consultas if texto.strip())
+    faixa = (pessoas_min, pessoas_max)
+
+    with medir('pesquisa e filtros da grade') as etapa:
+        if df is None:
+            grade = (filtros, None, consultas, faixa)
+            total = contar_grade_banco(chave, grade)
+        else:
+            if consultas:
+                indice_busca = obter_indice_busca(chave, df)
+                for coluna, texto in consultas:
+                    posicoes = posicoes[pesquisar(indice_busca, posicoes, texto, coluna)]
+
+            if pessoas_min is not None or pessoas_max is not None:
+                posicoes = filtrar_faixa(df, posicoes, 'Pessoas Impactadas', pessoas_min, pessoas_max)
+
+            total = len(posicoes)
+
+        etapa['linhas'] = total
+
+    # Ordenação e paginação
+    col1, col2 = st.columns([3, 1])
+
+    with col1:
+        coluna_ordem = st.selectbox("Ordenar por", COLUNAS_EXIBICAO, key="grade_ordem_coluna")
+
+    with col2:
+        sentido = st.selectbox("Sentido", ['Crescente', 'Decrescente'], key="grade_ordem_sentido")
+
+    ordem = (coluna_ordem, sentido == 'Decrescente')
+
+    if df is not None:
+        with medir('ordenação da grade', linhas=total):
+            # Linhas já estão em ordem de data: ordenar por Data só inverte quando decrescente
+            if coluna_ordem == 'Data':
+                posicoes = posicoes[::-1] if sentido == 'Decrescente' else posicoes
+            else:
+                chaves = obter_chave_ordenacao(chave, coluna_ordem, df)
+                posicoes = ordenar_posicoes(chaves, posicoes, sentido == 'Decrescente')
+
+    inicio, fim = controles_paginacao(total, "grade", opcoes_tamanho=TAMANHOS_PAGINA_GRADE)
+
+    # Exibir apenas a página atual
+    with medir('tabela detalhada', linhas=fim - inicio):
+        if df is None:
+            pagina = consultar_pagina_banco(chave, grade, ordem, inicio, fim)
+            pagina = formatar_pagina(pagina, np.arange(len(pagina)))
+        else:
+            pagina = formatar_pagina(df, posicoes[inicio:fim])
+
+        st.dataframe(
+            pagina,
+            width='stretch',
+            hide_index=True
+        )
+
+    # Exportação sob demanda: todas as linhas da grade, na ordem exibida
+    st.markdown("#### 📥 Exportar dados filtrados")
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        formato = st.selectbox("Formato", list(FORMATOS_EXPORTACAO), key="exportacao_formato")
+
+    extensao, mime, _ = FORMATOS_EXPORTACAO[formato]
+    if df is None:
+        gerar_blocos = functools.partial(blocos_banco, chave, grade, ordem)
+    else:
+        gerar_blocos = functools.partial(blocos_exportacao, df, posicoes)
+
+    # O arquivo só vale para a execução em que foi preparado: a interação seguinte
+    # o descarta, e o botão de download não é reenviado a cada reexecução
+    descartar_exportacao()
+
+    with col2:
+        # O botão de preparar dá lugar ao de download quando o arquivo fica pronto
+        area_botao = st.empty()
+
+        if area_botao.button(f"Preparar arquivo ({total} linhas)", key="exportacao_preparar"):
+            try:
+                with st.spinner("Gerando arquivo..."), medir('exportação', linhas=total):
+                    caminho = preparar_exportacao(gerar_blocos(), formato)
+            except ValueError as erro:
+                st.error(str(erro))
             else:
-                st.info("Nenhuma ação comunitária encontrada no período selecionado.")
+                st.session_state['exportacao'] = {'caminho': caminho}
+                with open(caminho, 'rb') as arquivo:
+                    area_botao.download_button(
+                        label=f"📥 Baixar dados filtrados ({formato})",
+                        data=arquivo,
+                        file_name=f'acoes_sesmt_{datetime.now().strftime("%Y%m%d")}.{extensao}',
+                        mime=mime,
+                        on_click='ignore',
+                    )
 
-        # TAB 5 - DADOS DETALHADOS
-        with tab5:
-            st.markdown("### 📋 Tabela Completa de Ações")
 
-            # Preparar dados para exibição
-            df_exibicao = df_filtrado[
-                ['Data', 'Evento', 'Pessoas Impactadas', 'Colaborador', 'Contrato', 'Tipo', 'Observações']].copy()
-            df_exibicao['Data'] = df_exibicao['Data'].dt.strftime('%d/%m/%Y')
+def secao_quarentena(quarentena):
+    """Aviso das linhas que não passaram na validação, com os problemas e a tabela para correção"""
+    if quarentena.empty:
+        return
 
-            # Mostrar estatísticas
-            col1, col2, col3, col4 = st.columns(4)
+    st.warning(
+        f"⚠️ {len(quarentena)} linha(s) da planilha foram ignoradas por dados inválidos. "
+        "Os indicadores consideram apenas as linhas válidas."
+    )
+
+    with st.expander("🧪 Linhas em quarentena"):
+        problemas = quarentena['Problemas'].str.split('; ').explode().value_counts()
+        st.dataframe(
+            problemas.rename_axis('Problema').reset_index(name='Linhas'),
+            width='stretch',
+            hide_index=True
+        )
+        st.dataframe(quarentena, width='stretch', hide_index=True)
+        st.download_button(
+            label="📥 Baixar linhas em quarentena (CSV)",
+            data=quarentena.to_csv(index=False).encode('utf-8'),
+            file_name=f'quarentena_sesmt_{datetime.now().strftime("%Y%m%d")}.csv',
+            mime='text/csv',
+        )
+
+
+def mostrar_estrutura_esperada():
+    """Expander com as colunas e formatos aceitos na planilha"""
+    with st.expander("📖 Estrutura esperada do arquivo"):
+        st.markdown("""
+        A planilha deve conter as seguintes colunas:
 
-            with col1:
-                st.metric("Total de Registros", len(df_exibicao))
+        - **Data**: Data da ação (data do Excel ou texto dd/mm/aaaa)
+        - **Evento**: Nome/tipo do evento realizado
+        - **Pessoas Impactadas**: Número de participantes (inteiro maior ou igual a zero)
+        - **Observações**: Detalhes da ação
+        - **Colaborador**: Responsável pela ação
+        - **Cargo**: Cargo do responsável
+        - **Contrato**: Região/contrato (Oeste, Nordeste, etc.)
+        - **Tipo**: Tipo de ação (Interno, Treinamento, Comunidade, EQTL)
 
-            with col2:
-                st.metric("Tipos Diferentes", df_exibicao['Tipo'].nunique())
+        Linhas com data ausente ou inválida, ou com pessoas impactadas fora do
+        formato, são separadas em quarentena e não entram nos indicadores.
+        """)
 
-            with col3:
-                st.metric("Eventos Diferentes", df_exibicao['Evento'].nunique())
 
-            with col4:
-                st.metric("Colaboradores", df_exibicao['Colaborador'].nunique())
+# Etapas cronometradas desta execução completa da página (perfil de desempenho)
+st.session_state['perfil_execucao'] = []
+
+# Header Principal
+st.markdown(f"""
+<div class="main-title">
+    <h1>⚡ BI SESMT - Rezende Energia</h1>
+    <p>Acompanhamento de Ações de Segurança do Trabalho</p>
+</div>
+""", unsafe_allow_html=True)
+
+# Versão da pasta monitorada usada em toda esta execução (novas versões só na próxima)
+base_monitorada = obter_monitor(PASTA_MONITORADA, INTERVALO_MONITORAMENTO_S).atual if PASTA_MONITORADA else None
+
+# Sidebar com upload
+with st.sidebar:
+    if PASTA_MONITORADA:
+        st.markdown("### 📂 Pasta Monitorada")
+        acompanhar_pasta(base_monitorada.versao if base_monitorada is not None else None)
+        uploaded_files = []
+    else:
+        st.markdown("### 📤 Upload de Dados")
+        uploaded_files = st.file_uploader(
+            "Carregar planilhas de acompanhamento",
+            type=['xlsx', 'xls'],
+            accept_multiple_files=True,
+            help="Faça upload de uma ou mais planilhas de Acompanhamento de Ações SESMT; "
+                 "registros repetidos entre arquivos são considerados uma única vez"
+        )
+
+    st.markdown("---")
+    st.markdown("### 📊 Navegação")
+    st.info("Selecione uma aba acima para visualizar diferentes análises")
+
+    st.markdown("---")
+    st.markdown("### ℹ️ Sobre")
+    st.markdown("**Rezende Energia**")
+    st.markdown("Sistema de Business Intelligence para monitoramento de ações do SESMT")
+
+# Importar as planilhas enviadas no banco local, quando configurado
+resumo_banco = None
+if CAMINHO_BANCO and not PASTA_MONITORADA:
+    quarentenas = {}
+    with medir('importação no banco'):
+        for arquivo in uploaded_files or []:
+            try:
+                chave_arquivo, df_arquivo, quarentena = carregar_planilha(arquivo)
+            except ErroEsquema as erro:
+                # A planilha fora do formato não é importada; as demais seguem normalmente
+                st.error(f"{arquivo.name}: {erro}")
+                continue
+            importar_no_banco(chave_arquivo, df_arquivo)
+            quarentenas[arquivo.name] = quarentena
+
+    versao = versao_banco()
+    resumo_banco = consultar_resumo_banco(versao)
+
+# Verificar se há dados carregados (planilhas enviadas, pasta monitorada ou banco local com registros)
+if uploaded_files or base_monitorada is not None or (resumo_banco and resumo_banco['registros']):
+    # Carregar dados
+    try:
+        if resumo_banco:
+            # Consultas executadas no banco; a sessão só recebe agregados e a página visível.
+            # Sem linhas em memória (df None), a chave da base é a versão do banco
+            chave, df, motor = versao, None, None
+            motor_cubo = obter_motor_cubo_banco(versao)
+            cubo = motor_cubo.dados
+            serie = consultar_serie_banco(versao)
+            min_date, max_date = resumo_banco['min_date'], resumo_banco['max_date']
+            quarentena = combinar_quarentenas(quarentenas)
+        elif base_monitorada is not None:
+            # Base, cubo e série já montados pela thread de monitoramento
+            chave, df = base_monitorada.chave, base_monitorada.df
+            cubo, serie = base_monitorada.cubo, base_monitorada.serie
+            quarentena = base_monitorada.quarentena
+            motor_cubo = obter_motor_cubo(chave, cubo, df)
+            min_date, max_date = df['Data'].min(), df['Data'].max()
+        else:
+            with medir('carga e mesclagem') as etapa:
+                combinada = mesclar_planilhas(uploaded_files)
+                chave, df, quarentena = combinada['chave'], combinada['df'], combinada['quarentena']
+                etapa['linhas'] = len(df)
+            with medir('cubo de agregados') as etapa:
+                cubo = obter_cubo(chave, df)
+                etapa['linhas'] = len(cubo)
+            motor_cubo = obter_motor_cubo(chave, cubo, df)
+            serie = combinada['serie'] or obter_serie_temporal(chave, df)
+            min_date, max_date = df['Data'].min(), df['Data'].max()
+
+        # Sidebar - Filtros
+        with st.sidebar:
+            if resumo_banco:
+                st.caption(f"Banco local: {resumo_banco['registros']} registros")
+            elif base_monitorada is not None:
+                st.caption(
+                    f"{len(base_monitorada.arquivos)} planilha(s) da pasta · {len(df)} registros · "
+                    f"{base_monitorada.duplicadas} registros repetidos ignorados"
+                )
+            elif len(uploaded_files) > 1:
+                st.caption(
+                    f"{len(uploaded_files)} planilhas combinadas · {len(df)} registros · "
+                    f"{combinada['duplicadas']} registros repetidos ignorados"
+                )
 
             st.markdown("---")
+            st.markdown("### 🔍 Filtros")
 
-            # Barra de pesquisa
-            search = st.text_input("🔍 Pesquisar na tabela", "")
+            # Seleções feitas sobre outra base podem não existir nesta: os filtros recomeçam
+            if st.session_state.get('filtros_base') != chave:
+                for coluna in FILTROS_DIMENSAO:
+                    st.session_state.pop(f"filtro_{coluna}", None)
+                st.session_state.pop('filtros', None)
+                st.session_state['filtros_base'] = chave
+
+            st.session_state['execucao_completa'] = True
+            try:
+                painel_filtros(motor_cubo, min_date, max_date)
+            finally:
+                st.session_state['execucao_completa'] = False
+
+        filtros = st.session_state['filtros']
+
+        # Aplicar filtros às linhas e ao cubo de agregados
+        with medir('filtros') as etapa:
+            # Meses inteiros do período saem do cubo; os dias das bordas, de agregados sob demanda
+            cubo_filtrado = motor_cubo.fatiar(filtros)
+
+            if resumo_banco:
+                indexador = None
+                etapa['linhas'] = int(cubo_filtrado['Qtd Ações'].sum())
+            else:
+                # As abas recebem o indexador (fatia ou posições), sem cópia das linhas filtradas
+                motor = obter_motor_filtros(chave, df)
+                indexador = motor.filtrar(filtros)
+                etapa['linhas'] = len(df.index[indexador])
 
-            if search:
-                df_exibicao = df_exibicao[
-                    df_exibicao.apply(lambda row: row.astype(str).str.contains(search, case=False).any(), axis=1)
-                ]
+        secao_quarentena(quarentena)
 
-            # Exibir tabela
-            st.dataframe(
-                df_exibicao,
-                use_container_width=True,
-                hide_index=True,
-                height=600
-            )
+        # Criar tabs
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+            "📊 Visão Geral",
+            "📈 Análise por Categoria",
+            "🗺️ Análise Regional",
+            "👥 Ações Comunitárias",
+            "📋 Dados Detalhados"
+        ])
 
-            # Botão de download
-            csv = df_exibicao.to_csv(index=False).encode('utf-8-sig')
-            st.download_button(
-                label="📥 Baixar dados filtrados (CSV)",
-                data=csv,
-                file_name=f'acoes_sesmt_{datetime.now().strftime("%Y%m%d")}.csv',
-                mime='text/csv',
-            )
+        # Cálculos das abas (em paralelo com SESMT_TRABALHADORES); cada aba aguarda só o seu
+        calculos = agendar_abas(cubo, cubo_filtrado, serie, motor_cubo, filtros, chave, df, motor, indexador)
+
+        with tab1:
+            aba_visao_geral(calculos['visao_geral'])
+
+        with tab2:
+            aba_categorias(calculos['categorias'])
+
+        with tab3:
+            aba_regional(calculos['regional'])
+
+        with tab4:
+            aba_comunidade(chave, df, filtros, calculos['comunidade'])
+
+        with tab5:
+            aba_dados(chave, df, filtros, calculos['dados'])
+
+    except ErroEsquema as e:
+        st.error(f"Planilha fora do formato esperado: {str(e)}")
+        mostrar_estrutura_esperada()
 
     except Exception as e:
         st.error(f"Erro ao processar arquivo: {str(e)}")
@@ -642,26 +1723,38 @@ if uploaded_file is not None:
 
 else:
     # Página inicial sem dados
-    st.markdown("""
+    if PASTA_MONITORADA:
+        titulo_inicial = "📂 Aguardando planilhas na pasta monitorada"
+        texto_inicial = "Os dados aparecem automaticamente quando houver planilhas .xlsx na pasta do servidor."
+    else:
+        titulo_inicial = "👈 Faça o upload da planilha para começar"
+        texto_inicial = "Carregue o arquivo Excel com os dados de acompanhamento do SESMT na barra lateral."
+
+    st.markdown(f"""
     <div style='text-align: center; padding: 50px;'>
-        <h2 style='color: #666;'>👈 Faça o upload da planilha para começar</h2>
+        <h2 style='color: #666;'>{titulo_inicial}</h2>
         <p style='color: #999; font-size: 1.1rem;'>
-            Carregue o arquivo Excel com os dados de acompanhamento do SESMT na barra lateral.
+            {texto_inicial}
         </p>
     </div>
     """, unsafe_allow_html=True)
 
     # Mostrar exemplo de estrutura esperada
-    with st.expander("📖 Estrutura esperada do arquivo"):
-        st.markdown("""
-        A planilha deve conter as seguintes colunas:
-
-        - **Data**: Data da ação
-        - **Evento**: Nome/tipo do evento realizado
-        - **Pessoas Impactadas**: Número de participantes
-        - **Observações**: Detalhes da ação
-        - **Colaborador**: Responsável pela ação
-        - **Cargo**: Cargo do responsável
-        - **Contrato**: Região/contrato (Oeste, Nordeste, etc.)
-        - **Tipo**: Tipo de ação (Interno, Treinamento, Comunidade, EQTL)
-        """)
\ No newline at end of file
+    mostrar_estrutura_esperada()
+
+# Painel de perfil: etapas da última execução completa (reexecuções de fragmentos não o atualizam)
+if perfil_ativo():
+    with st.sidebar:
+        with st.expander("⏱️ Perfil de desempenho"):
+            registros = pd.DataFrame(
+                st.session_state['perfil_execucao'], columns=['etapa', 'segundos', 'linhas', 'memoria_mb']
+            )
+            registros['linhas'] = registros['linhas'].astype('Int64')
+            st.metric("Tempo total das etapas", f"{registros['segundos'].sum():.2f} s")
+            st.dataframe(
+                registros.rename(columns={
+                    'etapa': 'Etapa', 'segundos': 'Segundos', 'linhas': 'Linhas', 'memoria_mb': 'Δ Memória (MB)'
+                }),
+                width='stretch',
+                hide_index=True
+            )
\ No newline at end of file
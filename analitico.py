@@ -0,0 +1,1087 @@
+"""Núcleo analítico do BI SESMT
+
+Leitura e processamento das planilhas, cubo de agregados, filtros, pesquisa e as
+consolidações exibidas em cada aba. O dashboard (acoessesmt.py) apenas renderiza
+estes resultados; o mesmo código serve a benchmarks e processamentos em lote.
+"""
+import io
+import os
+import threading
+import unicodedata
+from dataclasses import dataclass
+from zipfile import is_zipfile
+
+import numpy as np
+import pandas as pd
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# Snapshots colunares dos dados processados (incrementar a versão ao mudar processar_dados)
+PASTA_SNAPSHOTS = os.environ.get(
+    "SESMT_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sesmt_snapshots")
+)
+VERSAO_SNAPSHOT = 6
+# Snapshots da versão atual mantidos na pasta (os usados há mais tempo são removidos)
+LIMITE_SNAPSHOTS = int(os.environ.get("SESMT_SNAPSHOT_MAX", "200"))
+
+# Colunas lidas da planilha (as demais são ignoradas na leitura); todas são obrigatórias
+COLUNAS_PLANILHA = [
+    'Data', 'Evento', 'Pessoas Impactadas', 'Observações', 'Colaborador', 'Cargo', 'Contrato', 'Tipo'
+]
+
+# Linhas com problema são separadas da base com a origem e os problemas encontrados
+COLUNAS_QUARENTENA = ['Arquivo', 'Aba', 'Linha', 'Problemas'] + COLUNAS_PLANILHA
+
+# Quantidade de linhas convertidas em DataFrame por vez durante a leitura
+TAMANHO_LOTE_LEITURA = 20_000
+
+# Campos que identificam um registro de ação ao mesclar várias planilhas
+CHAVE_REGISTRO = ['Data', 'Evento', 'Colaborador', 'Contrato']
+
+# Tradução manual dos meses para garantir que funcione
+MESES_PT = {
+    1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
+    5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
+    9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+}
+
+# Colunas de dimensão armazenadas como Categorical
+COLUNAS_DIMENSAO = ['Tipo', 'Contrato', 'Evento', 'Colaborador', 'Cargo']
+
+# Texto livre em buffers Arrow: imutáveis e bem menores que objetos str do Python
+COLUNAS_TEXTO = ['Observações']
+TIPOS_TEXTO_ARROW = {pa.string(): pd.StringDtype('pyarrow'), pa.large_string(): pd.StringDtype('pyarrow')}
+
+# Dimensões e medidas do cubo de agregados (Data é o primeiro dia do mês). Colaborador e
+# Cargo ficam de fora: multiplicariam as células até quase o número de linhas
+DIMENSOES_CUBO = ['Data', 'Mês_Ordenacao', 'Mês_Nome', 'Tipo', 'Contrato', 'Evento']
+MEDIDAS_CUBO = ['Qtd Ações', 'Total Pessoas', 'Qtd Pessoas']
+
+# Série temporal: dimensões mantidas, medidas com indicadores e janelas móveis (meses)
+DIMENSOES_SERIE = ['Contrato', 'Tipo']
+MEDIDAS_SERIE = ['Qtd Ações', 'Total Pessoas']
+JANELAS_MOVEIS = (3, 12)
+
+# Colunas da tabela detalhada (também indexadas para a pesquisa)
+COLUNAS_EXIBICAO = ['Data', 'Evento', 'Pessoas Impactadas', 'Colaborador', 'Contrato', 'Tipo', 'Observações']
+
+# Linhas convertidas por vez ao exportar (o arquivo é escrito em blocos)
+TAMANHO_BLOCO_EXPORTACAO = 50_000
+
+# Limite de linhas de uma aba do Excel (descontado o cabeçalho)
+LIMITE_LINHAS_XLSX = 1_048_575
+
+# Quantidade de eventos nos rankings da aba de categorias
+LIMITE_RANKING = 10
+
+
+# Validação
+class ErroEsquema(ValueError):
+    """Planilha sem as colunas esperadas (falha antes da leitura das linhas)"""
+
+
+def limpar_textos(serie: pd.Series) -> pd.Series:
+    """Remove espaços das pontas dos textos; textos vazios viram ausentes"""
+    if serie.dtype != object:
+        return serie
+
+    eh_texto = serie.map(type) == str
+    if not eh_texto.any():
+        return serie
+
+    limpos = serie[eh_texto].str.strip()
+    return serie.mask(eh_texto, limpos.where(limpos != ''))
+
+
+def converter_datas(serie: pd.Series) -> pd.Series:
+    """Datas como datetime64 (NaT quando inválidas)
+
+    Datas do Excel são mantidas, números são lidos como data serial do Excel e
+    textos como dia/mês/ano (formatos ISO também são aceitos).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+
+    tipos = serie.map(type)
+    eh_texto = tipos == str
+    eh_numero = tipos.isin([int, float])
+
+    datas = pd.to_datetime(serie.where(~eh_texto & ~eh_numero), errors='coerce')
+
+    if eh_numero.any():
+        numeros = serie[eh_numero].astype('float64')
+        datas = datas.mask(eh_numero, pd.to_datetime(numeros, unit='D', origin='1899-12-30', errors='coerce'))
+
+    if eh_texto.any():
+        textos = serie[eh_texto]
+        convertidas = pd.to_datetime(textos, format='%d/%m/%Y', errors='coerce')
+        restantes = convertidas.isna()
+        if restantes.any():
+            convertidas[restantes] = pd.to_datetime(
+                textos[restantes], dayfirst=True, format='mixed', errors='coerce'
+            )
+        datas = datas.mask(eh_texto, convertidas)
+
+    return datas
+
+
+def converter_numeros(serie: pd.Series) -> pd.Series:
+    """Números como float64 (NaN quando ausentes ou inválidos); textos aceitam '1.234' e '12,5'"""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype('float64')
+
+    tipos = serie.map(type)
+    numeros = pd.to_numeric(serie.where(tipos.isin([int, float])), errors='coerce').astype('float64')
+
+    eh_texto = tipos == str
+    if eh_texto.any():
+        textos = serie[eh_texto].str.replace(r'\.(?=\d{3}(?:\D|$))', '', regex=True).str.replace(',', '.')
+        numeros = numeros.mask(eh_texto, pd.to_numeric(textos, errors='coerce'))
+
+    return numeros
+
+
+def validar_lote(lote: pd.DataFrame, aba: str, linhas) -> tuple:
+    """Coerção de tipos e validação vetorizada de um lote lido da planilha
+
+    Retorna (válidas, quarentena). As válidas saem com Data em datetime64,
+    Pessoas Impactadas numérico e dimensões como Categorical. A quarentena
+    traz os valores originais (como texto) das linhas com problema, com a aba,
+    a linha da planilha e a lista de problemas encontrados.
+    """
+    lote = lote.apply(limpar_textos)
+
+    datas = converter_datas(lote['Data'])
+    pessoas = converter_numeros(lote['Pessoas Impactadas'])
+    informadas = lote['Pessoas Impactadas'].notna()
+
+    verificacoes = {
+        'Data ausente': lote['Data'].isna(),
+        'Data inválida': datas.isna() & lote['Data'].notna(),
+        'Pessoas Impactadas não numérico': pessoas.isna() & informadas,
+        'Pessoas Impactadas negativo': pessoas < 0,
+        'Pessoas Impactadas fracionário': (pessoas % 1).fillna(0) != 0,
+    }
+    invalidas = np.logical_or.reduce([mascara.to_numpy() for mascara in verificacoes.values()])
+
+    # Textos e dimensões: valores não textuais (números, datas) viram texto
+    for coluna in lote.columns.drop(['Data', 'Pessoas Impactadas']):
+        serie = lote[coluna]
+        if serie.dtype == object:
+            lote[coluna] = serie.mask(serie.notna() & (serie.map(type) != str), serie.astype(str))
+
+    validas = lote[~invalidas].assign(**{'Data': datas[~invalidas], 'Pessoas Impactadas': pessoas[~invalidas]})
+    for coluna in COLUNAS_DIMENSAO:
+        if coluna in validas.columns:
+            validas[coluna] = validas[coluna].astype('category')
+
+    problemas = np.full(int(invalidas.sum()), '', dtype=object)
+    for nome, mascara in verificacoes.items():
+        problemas = np.where(mascara.to_numpy()[invalidas], problemas + nome + '; ', problemas)
+
+    quarentena = lote[invalidas].astype('string')
+    quarentena.insert(0, 'Problemas', pd.array([texto[:-2] for texto in problemas], dtype='string'))
+    quarentena.insert(0, 'Linha', np.asarray(linhas)[invalidas])
+    quarentena.insert(0, 'Aba', aba)
+
+    return validas.reset_index(drop=True), quarentena.reset_index(drop=True)
+
+
+def compactar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """Pessoas Impactadas em int32 quando todos os valores estão presentes (float64 se houver ausentes)"""
+    pessoas = df['Pessoas Impactadas']
+    if len(pessoas) and pessoas.notna().all() and pessoas.max() <= np.iinfo(np.int32).max:
+        df['Pessoas Impactadas'] = pessoas.astype(np.int32)
+    return df
+
+
+def conferir_cabecalho(aba: str, cabecalho) -> dict:
+    """{coluna: posição} das colunas esperadas; ErroEsquema se faltar alguma"""
+    posicoes = {}
+    for i, nome in enumerate(cabecalho):
+        nome = nome.strip() if isinstance(nome, str) else nome
+        if nome in COLUNAS_PLANILHA and nome not in posicoes:
+            posicoes[nome] = i
+
+    ausentes = [coluna for coluna in COLUNAS_PLANILHA if coluna not in posicoes]
+    if ausentes:
+        raise ErroEsquema(f"Aba '{aba}' sem as colunas esperadas: {', '.join(ausentes)}")
+    return posicoes
+
+
+def combinar_quarentenas(quarentenas: dict) -> pd.DataFrame:
+    """Quarentenas de várias planilhas ({nome do arquivo: quarentena}) numa só tabela"""
+    partes = [quarentena.assign(Arquivo=nome) for nome, quarentena in quarentenas.items() if len(quarentena)]
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_QUARENTENA)
+    return pd.concat(partes, ignore_index=True)[COLUNAS_QUARENTENA]
+
+
+def chave_quarentena(chave: str) -> str:
+    """Chave do snapshot da quarentena de uma planilha"""
+    return f"{chave}-quarentena"
+
+
+# Leitura e processamento
+def combinar_lotes(lotes) -> pd.DataFrame:
+    """Concatena os lotes unificando as categorias das colunas de dimensão"""
+    if not lotes:
+        return pd.DataFrame(columns=COLUNAS_PLANILHA)
+
+    combinado = pd.concat(lotes, ignore_index=True)
+
+    # pd.concat de categorias diferentes vira object; union_categoricals mantém códigos.
+    # As categorias ficam em ordem alfabética, da qual dependem ordenação e listas de opções.
+    for coluna in COLUNAS_DIMENSAO:
+        if coluna in combinado.columns:
+            partes = [lote[coluna] for lote in lotes if coluna in lote.columns]
+            if len(partes) == len(lotes):
+                combinado[coluna] = union_categoricals(partes, sort_categories=True, ignore_order=True)
+
+    return combinado
+
+
+def ler_planilha(conteudo: bytes) -> tuple:
+    """Lê todas as abas da planilha em modo streaming, apenas com as colunas usadas
+
+    As linhas são validadas e convertidas em lotes de TAMANHO_LOTE_LEITURA, de
+    modo que o pico de memória da leitura acompanha o tamanho do lote e não o
+    da planilha. Retorna (linhas válidas, quarentena). Abas sem a coluna 'Data'
+    no cabeçalho são ignoradas; as demais precisam de todas as colunas
+    esperadas, conferidas antes da leitura das linhas (ErroEsquema).
+    """
+    validas, quarentenas = [], []
+    abas_lidas = 0
+
+    if not is_zipfile(io.BytesIO(conteudo)):
+        # Formato .xls (não suportado pelo openpyxl): leitura convencional
+        abas = pd.read_excel(io.BytesIO(conteudo), sheet_name=None, dtype=object)
+        for nome, aba in abas.items():
+            aba.columns = [coluna.strip() if isinstance(coluna, str) else coluna for coluna in aba.columns]
+            if 'Data' not in aba.columns:
+                continue
+            conferir_cabecalho(nome, aba.columns)
+            abas_lidas += 1
+            lote, quarentena = validar_lote(aba[COLUNAS_PLANILHA], nome, aba.index + 2)
+            validas.append(lote)
+            quarentenas.append(quarentena)
+    else:
+        workbook = openpyxl.load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+
+        try:
+            for aba in workbook.worksheets:
+                linhas = aba.iter_rows(values_only=True)
+                cabecalho = next(linhas, None) or ()
+
+                if 'Data' not in (nome.strip() if isinstance(nome, str) else nome for nome in cabecalho):
+                    continue
+
+                posicoes = conferir_cabecalho(aba.title, cabecalho)
+                abas_lidas += 1
+                colunas = list(posicoes)
+                indices = list(posicoes.values())
+                pendentes, numeros = [], []
+
+                def converter_pendentes():
+                    lote, quarentena = validar_lote(
+                        pd.DataFrame.from_records(pendentes, columns=colunas), aba.title, numeros
+                    )
+                    validas.append(lote)
+                    quarentenas.append(quarentena)
+
+                for numero, linha in enumerate(linhas, start=2):
+                    valores = tuple(linha[i] if i < len(linha) else None for i in indices)
+                    if all(valor is None for valor in valores):
+                        continue
+
+                    pendentes.append(valores)
+                    numeros.append(numero)
+                    if len(pendentes) >= TAMANHO_LOTE_LEITURA:
+                        converter_pendentes()
+                        pendentes, numeros = [], []
+
+                if pendentes:
+                    converter_pendentes()
+        finally:
+            workbook.close()
+
+    if not abas_lidas:
+        raise ErroEsquema("Nenhuma aba da planilha tem a coluna 'Data'")
+
+    quarentena = pd.concat(quarentenas, ignore_index=True) if quarentenas else pd.DataFrame(
+        columns=COLUNAS_QUARENTENA[1:]
+    )
+    return compactar_tipos(combinar_lotes(validas)), quarentena
+
+
+def processar_dados(df: pd.DataFrame) -> pd.DataFrame:
+    """Processa os dados do arquivo"""
+    import locale
+
+    # Tentar configurar locale para português
+    try:
+        locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
+    except:
+        try:
+            locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil.1252')
+        except:
+            pass
+
+    # Converter data para datetime e calcular o período uma única vez
+    df['Data'] = pd.to_datetime(df['Data'])
+    periodos = df['Data'].dt.to_period('M')
+    df['Mês'] = periodos
+
+    # Rótulos montados apenas para os meses distintos e expandidos pelos códigos
+    codigos, meses_unicos = pd.factorize(periodos, sort=True)
+    df['Mês_Ordenacao'] = pd.Categorical.from_codes(
+        codigos, categories=meses_unicos.astype(str), ordered=True
+    )
+    df['Mês_Nome'] = pd.Categorical.from_codes(
+        codigos,
+        categories=[f"{MESES_PT[mes.month]}/{mes.year}" for mes in meses_unicos],
+        ordered=True
+    )
+
+    # Dimensões como Categorical: groupby e filtros operam sobre códigos inteiros
+    for coluna in COLUNAS_DIMENSAO:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype('category')
+
+    for coluna in COLUNAS_TEXTO:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(pd.StringDtype('pyarrow'))
+
+    # Ordenação por Data permite filtrar o período com busca binária
+    return df.sort_values('Data', kind='stable', ignore_index=True)
+
+
+# Snapshots
+def caminho_snapshot(chave: str) -> str:
+    """Caminho do snapshot Feather de uma planilha"""
+    return os.path.join(PASTA_SNAPSHOTS, f"{chave}-v{VERSAO_SNAPSHOT}.feather")
+
+
+def ler_snapshot(chave: str) -> pd.DataFrame | None:
+    """Carrega o snapshot processado, se existir
+
+    O arquivo é mapeado em memória, mas a conversão para pandas copia as
+    colunas: o ganho é não reler a planilha, não economia de memória.
+    """
+    caminho = caminho_snapshot(chave)
+    if not os.path.exists(caminho):
+        return None
+
+    try:
+        # Texto volta em buffers Arrow (como em processar_dados), sem passar por objetos str
+        df = feather.read_table(caminho, memory_map=True).to_pandas(types_mapper=TIPOS_TEXTO_ARROW.get)
+        # A data de modificação marca o último uso, para podar_snapshots
+        os.utime(caminho)
+        return df
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def salvar_snapshot(chave: str, df: pd.DataFrame) -> None:
+    """Grava o DataFrame processado em Feather sem compressão (escrita atômica)"""
+    caminho = caminho_snapshot(chave)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+
+    try:
+        os.makedirs(PASTA_SNAPSHOTS, exist_ok=True)
+        df.reset_index(drop=True).to_feather(temporario, compression='uncompressed')
+        os.replace(temporario, caminho)
+    except (OSError, ValueError, TypeError):
+        # Snapshot é apenas otimização; sem ele a planilha é lida normalmente
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        return
+
+    podar_snapshots()
+
+
+def podar_snapshots() -> None:
+    """Remove snapshots de versões anteriores e, da atual, os usados há mais tempo além de LIMITE_SNAPSHOTS"""
+    sufixo = f"-v{VERSAO_SNAPSHOT}.feather"
+    atuais = []
+
+    try:
+        nomes = os.listdir(PASTA_SNAPSHOTS)
+    except OSError:
+        return
+
+    for nome in nomes:
+        caminho = os.path.join(PASTA_SNAPSHOTS, nome)
+        try:
+            if nome.endswith(sufixo):
+                atuais.append((os.path.getmtime(caminho), caminho))
+            elif nome.endswith('.feather'):
+                os.remove(caminho)
+        except OSError:
+            # Outra sessão pode ter removido ou substituído o arquivo
+            pass
+
+    atuais.sort(reverse=True)
+    for _, caminho in atuais[LIMITE_SNAPSHOTS:]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+# Mesclagem de planilhas
+def chaves_registro(df: pd.DataFrame) -> np.ndarray:
+    """Hash estável (uint64) de Data+Evento+Colaborador+Contrato de cada linha"""
+    return pd.util.hash_pandas_object(df[CHAVE_REGISTRO], index=False).to_numpy()
+
+
+def anexar_ineditos(novos: list, chaves_existentes: np.ndarray | None = None) -> tuple:
+    """Linhas dos DataFrames novos cujo registro (CHAVE_REGISTRO) ainda não existe
+
+    Retorna (partes, chaves, duplicadas): as partes inéditas de cada DataFrame,
+    as chaves existentes acrescidas das novas e quantas linhas foram descartadas.
+    Repetições dentro de um mesmo DataFrame são mantidas.
+    """
+    chaves = np.empty(0, dtype=np.uint64) if chaves_existentes is None else chaves_existentes
+    partes, duplicadas = [], 0
+
+    for df in novos:
+        chaves_df = chaves_registro(df)
+        inedita = ~np.isin(chaves_df, chaves)
+
+        partes.append(df[inedita])
+        chaves = np.concatenate([chaves, chaves_df[inedita]])
+        duplicadas += int((~inedita).sum())
+
+    return partes, chaves, duplicadas
+
+
+# Cubo de agregados
+def agregar_linhas(df: pd.DataFrame, dimensoes: list) -> pd.DataFrame:
+    """Medidas do cubo calculadas sobre as linhas, por combinação das dimensões"""
+    agregado = df.groupby(dimensoes, observed=True, dropna=False).agg(**{
+        'Qtd Ações': ('Pessoas Impactadas', 'size'),
+        'Total Pessoas': ('Pessoas Impactadas', 'sum'),
+        'Qtd Pessoas': ('Pessoas Impactadas', 'count'),
+    })
+    return agregado.reset_index()
+
+
+def calcular_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """Cubo de contagens/somas por (mês, Tipo, Contrato, Evento)
+
+    Gráficos e tabelas resumo das abas saem de fatias e consolidações dele
+    (ver MotorCubo). Com um mês por célula, o tamanho do cubo acompanha os
+    meses e as combinações de dimensões, não a quantidade de linhas.
+    """
+    return agregar_linhas(df.assign(Data=df['Mês'].dt.to_timestamp()), DIMENSOES_CUBO)
+
+
+def agregar_cubo(cubo: pd.DataFrame, dimensoes: list) -> pd.DataFrame:
+    """Consolida o cubo nas dimensões informadas"""
+    agregado = cubo.groupby(dimensoes, observed=True)[MEDIDAS_CUBO].sum().reset_index()
+    agregado['Média Pessoas'] = agregado['Total Pessoas'] / agregado['Qtd Pessoas']
+    return agregado
+
+
+# Séries temporais
+@dataclass(frozen=True)
+class SerieTemporal:
+    """Agregados diários e mensais por (Contrato, Tipo) com as medidas do cubo
+
+    Imutável: atualizar_serie_temporal devolve uma nova série, de modo que
+    sessões e threads podem compartilhar a mesma instância.
+    """
+    diario: pd.DataFrame
+    mensal: pd.DataFrame
+
+
+def agregar_serie(dados: pd.DataFrame, periodos: pd.Series) -> pd.DataFrame:
+    """Soma as medidas por (período, Contrato, Tipo); aceita linhas de ações ou agregados do cubo"""
+    if 'Qtd Ações' in dados.columns:
+        medidas = dados[MEDIDAS_CUBO]
+    else:
+        pessoas = dados['Pessoas Impactadas']
+        medidas = pd.DataFrame({
+            'Qtd Ações': np.ones(len(dados), dtype=np.int64),
+            'Total Pessoas': pessoas.fillna(0),
+            'Qtd Pessoas': pessoas.notna().astype(np.int64),
+        }, index=dados.index)
+
+    chaves = [periodos, dados['Contrato'], dados['Tipo']]
+    return medidas.groupby(chaves, observed=True, dropna=False).sum().reset_index()
+
+
+def somar_series(partes: list, coluna_periodo: str) -> pd.DataFrame:
+    """Combina agregados de mesmas chaves somando as medidas (as medidas são aditivas)"""
+    combinado = pd.concat(partes, ignore_index=True)
+    chaves = [coluna_periodo] + DIMENSOES_SERIE
+    soma = combinado.groupby(chaves, observed=True, dropna=False)[MEDIDAS_CUBO].sum().reset_index()
+    return soma.astype({coluna: 'category' for coluna in DIMENSOES_SERIE})
+
+
+def construir_serie_temporal(dados: pd.DataFrame) -> SerieTemporal:
+    """Série diária e mensal a partir de linhas de ações ou de agregados diários com as medidas do cubo"""
+    diario = agregar_serie(dados, dados['Data'].dt.normalize().rename('Data'))
+    mensal = agregar_serie(diario, diario['Data'].dt.to_period('M').rename('Mês'))
+    return SerieTemporal(diario=diario, mensal=mensal)
+
+
+def atualizar_serie_temporal(serie: SerieTemporal, novos: pd.DataFrame) -> SerieTemporal:
+    """Incorpora linhas novas sem reprocessar as anteriores
+
+    Só as linhas novas são agregadas; o resultado é somado aos agregados já
+    existentes, o que cobre tanto períodos inéditos quanto dias e meses que
+    recebem registros adicionais.
+    """
+    if novos.empty:
+        return serie
+
+    incremento = construir_serie_temporal(novos)
+    return SerieTemporal(
+        diario=somar_series([serie.diario, incremento.diario], 'Data'),
+        mensal=somar_series([serie.mensal, incremento.mensal], 'Mês'),
+    )
+
+
+def mensal_dos_filtros(serie: SerieTemporal, motor_cubo: 'MotorCubo', filtros: tuple) -> pd.DataFrame:
+    """Agregados mensais de todo o histórico que atendem às seleções dos filtros
+
+    O período é tratado em indicadores_mensais. Seleções de Contrato e Tipo são
+    resolvidas pela própria série; as das demais colunas somam o cubo filtrado.
+    """
+    _, _, selecoes = filtros
+    if all(coluna in DIMENSOES_SERIE for coluna, _ in selecoes):
+        mensal = serie.mensal
+        for coluna, valores in selecoes:
+            mensal = mensal[mensal[coluna].isin(valores)]
+        return mensal
+
+    cubo = motor_cubo.fatiar((None, None, selecoes))
+    return agregar_serie(cubo, cubo['Data'].dt.to_period('M').rename('Mês'))
+
+
+def indicadores_mensais(serie: SerieTemporal, mensal: pd.DataFrame, filtros: tuple) -> pd.DataFrame:
+    """Totais mensais com variações, janelas móveis e acumulados, restritos aos meses do período
+
+    `mensal` traz os agregados selecionados (ver mensal_dos_filtros); a série
+    completa define o intervalo de meses. Os meses sem registros entram com
+    zero, para que variações e janelas sempre comparem meses de calendário. Os
+    cálculos usam todo o histórico anterior ao período; os meses são
+    considerados completos.
+    """
+    data_inicio, data_fim, _ = filtros
+
+    if serie.mensal.empty:
+        return pd.DataFrame(columns=['Mês', 'Mês_Nome'] + MEDIDAS_CUBO)
+
+    meses = pd.period_range(serie.mensal['Mês'].min(), serie.mensal['Mês'].max(), freq='M', name='Mês')
+    totais = mensal.groupby('Mês')[MEDIDAS_CUBO].sum().reindex(meses, fill_value=0)
+
+    for medida in MEDIDAS_SERIE:
+        valores = totais[medida]
+        mes_anterior = valores.shift(1)
+        ano_anterior = valores.shift(12)
+
+        totais[f'{medida} Mês Anterior'] = mes_anterior
+        totais[f'{medida} Var. Mês'] = (valores - mes_anterior) / mes_anterior.where(mes_anterior != 0)
+        totais[f'{medida} Ano Anterior'] = ano_anterior
+        totais[f'{medida} Var. Ano'] = (valores - ano_anterior) / ano_anterior.where(ano_anterior != 0)
+        for janela in JANELAS_MOVEIS:
+            totais[f'{medida} {janela}M'] = valores.rolling(janela, min_periods=1).sum().astype(valores.dtype)
+        totais[f'{medida} Acumulado'] = valores.cumsum()
+
+    if data_inicio is not None:
+        totais = totais.loc[pd.Period(data_inicio, 'M'):pd.Period(data_fim, 'M')]
+
+    totais.insert(0, 'Mês_Nome', [f"{MESES_PT[mes.month]}/{mes.year}" for mes in totais.index])
+    return totais.reset_index()
+
+
+# Filtros
+class MotorFiltros:
+    """Filtros sem cópia sobre dados (linhas ou cubo) ordenados por Data
+
+    O período vira uma fatia por busca binária nas datas ordenadas. Cada coluna
+    de dimensão ganha, no primeiro uso, um índice invertido valor -> posições
+    (ordenadas); combinar seleções é união dentro da coluna e interseção entre
+    colunas. O resultado é um indexador para .iloc: uma fatia (view, sem cópia)
+    quando só o período é filtrado, ou um array de posições em ordem de data.
+    """
+
+    def __init__(self, dados: pd.DataFrame, coluna_peso: str | None = None):
+        self.datas = dados['Data'].to_numpy()
+        self.dados = dados
+        self.pesos = dados[coluna_peso].to_numpy() if coluna_peso else None
+        self._indices = {}
+        self._lock = threading.Lock()
+
+    def indice(self, coluna):
+        """Códigos da coluna e índice invertido {valor: posições}"""
+        with self._lock:
+            if coluna not in self._indices:
+                serie = self.dados[coluna]
+                if not isinstance(serie.dtype, pd.CategoricalDtype):
+                    serie = serie.astype('category')
+
+                codigos = serie.cat.codes.to_numpy()
+                ordem = np.argsort(codigos, kind='stable')
+                limites = np.searchsorted(codigos[ordem], np.arange(len(serie.cat.categories) + 1))
+                posicoes = {
+                    valor: ordem[limites[i]:limites[i + 1]]
+                    for i, valor in enumerate(serie.cat.categories)
+                }
+                self._indices[coluna] = (codigos, serie.cat.categories, posicoes)
+
+            return self._indices[coluna]
+
+    def posicoes_selecao(self, coluna, valores):
+        """Posições (ordenadas) com qualquer um dos valores na coluna"""
+        posicoes = self.indice(coluna)[2]
+        partes = [posicoes[valor] for valor in valores if valor in posicoes]
+        if not partes:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(partes)) if len(partes) > 1 else partes[0]
+
+    def filtrar(self, filtros, ignorar=None):
+        """Indexador das linhas que atendem aos filtros (opcionalmente ignorando uma coluna)"""
+        data_inicio, data_fim, selecoes = filtros
+
+        inicio, fim = 0, len(self.datas)
+        if data_inicio is not None:
+            # A data final vale pelo dia inteiro (limite exclusivo no dia seguinte), como no banco
+            limite = pd.Timestamp(data_fim) + pd.Timedelta(days=1)
+            inicio = np.searchsorted(self.datas, np.datetime64(pd.Timestamp(data_inicio)), side='left')
+            fim = np.searchsorted(self.datas, np.datetime64(limite), side='left')
+
+        # Interseção começando pelas seleções mais restritivas
+        conjuntos = sorted(
+            (self.posicoes_selecao(coluna, valores) for coluna, valores in selecoes if coluna != ignorar),
+            key=len
+        )
+        if not conjuntos:
+            return slice(inicio, fim)
+
+        posicoes = conjuntos[0]
+        for conjunto in conjuntos[1:]:
+            posicoes = np.intersect1d(posicoes, conjunto, assume_unique=True)
+
+        return posicoes[np.searchsorted(posicoes, inicio):np.searchsorted(posicoes, fim)]
+
+    def restringir(self, indexador, coluna, valor):
+        """Posições do indexador cujo valor na coluna é igual ao informado"""
+        posicoes = self.posicoes_selecao(coluna, [valor])
+        if isinstance(indexador, slice):
+            inicio, fim, _ = indexador.indices(len(self.datas))
+            return posicoes[np.searchsorted(posicoes, inicio):np.searchsorted(posicoes, fim)]
+        return np.intersect1d(indexador, posicoes, assume_unique=True)
+
+    def contagens(self, filtros, coluna):
+        """Contagem por valor da coluna sob os filtros das demais colunas (facetas)"""
+        codigos, categorias, _ = self.indice(coluna)
+        indexador = self.filtrar(filtros, ignorar=coluna)
+
+        codigos = codigos[indexador]
+        pesos = self.pesos[indexador] if self.pesos is not None else None
+        validos = codigos >= 0
+
+        contagem = np.bincount(
+            codigos[validos],
+            weights=pesos[validos] if pesos is not None else None,
+            minlength=len(categorias)
+        )
+        return pd.Series(contagem.astype(np.int64), index=categorias)
+
+
+def dividir_periodo(data_inicio, data_fim) -> tuple:
+    """Meses inteiros do período e os trechos de dias que sobram nas bordas
+
+    Retorna (meses, bordas): meses é o par (primeiro dia, último dia) dos meses
+    inteiramente contidos no período, ou None; bordas são os trechos (início,
+    fim) que começam ou terminam no meio de um mês. Todos os limites são inclusivos.
+    """
+    um_dia = pd.Timedelta(days=1)
+    inicio = pd.Timestamp(data_inicio).normalize()
+    limite = pd.Timestamp(data_fim).normalize() + um_dia
+
+    primeiro = inicio.to_period('M').to_timestamp()
+    if primeiro < inicio:
+        primeiro += pd.offsets.MonthBegin(1)
+    fim_meses = limite.to_period('M').to_timestamp()
+
+    if fim_meses <= primeiro:
+        return None, [(inicio, limite - um_dia)]
+
+    bordas = []
+    if inicio < primeiro:
+        bordas.append((inicio, primeiro - um_dia))
+    if fim_meses < limite:
+        bordas.append((fim_meses, limite - um_dia))
+    return (primeiro, fim_meses - um_dia), bordas
+
+
+class MotorCubo:
+    """Filtros e facetas sobre o cubo mensal, exatos para qualquer período diário
+
+    Os meses inteiros do período saem das células do cubo. Os dias das bordas
+    (período começando ou terminando no meio de um mês) são agregados por
+    `agregar((inicio, fim, ()))` uma vez por trecho, e as seleções são aplicadas
+    sobre esse agregado pequeno. Seleções em colunas fora do cubo (Colaborador,
+    Cargo) não podem ser resolvidas nele: o cubo filtrado vem de
+    `agregar(filtros)` e as facetas de `contar(filtros, coluna)`, calculados
+    sobre a base (linhas em memória ou banco).
+    """
+
+    # Trechos de borda guardados (um por período escolhido recentemente)
+    LIMITE_BORDAS = 32
+
+    def __init__(self, cubo: pd.DataFrame, agregar, contar):
+        self.dados = cubo
+        self.motor = MotorFiltros(cubo, 'Qtd Ações')
+        self.agregar = agregar
+        self.contar = contar
+        self._bordas = {}
+        self._lock = threading.Lock()
+
+    def motor_borda(self, trecho):
+        """Motor de filtros do agregado de um trecho de dias"""
+        with self._lock:
+            motor = self._bordas.get(trecho)
+        if motor is not None:
+            return motor
+
+        motor = MotorFiltros(self.agregar((*trecho, ())), 'Qtd Ações')
+        with self._lock:
+            if len(self._bordas) >= self.LIMITE_BORDAS:
+                self._bordas.pop(next(iter(self._bordas)))
+            self._bordas[trecho] = motor
+        return motor
+
+    def resolve_selecoes(self, selecoes, ignorar=None) -> bool:
+        """Se todas as seleções (exceto a da coluna ignorada) são colunas do cubo"""
+        return all(coluna in self.dados.columns for coluna, _ in selecoes if coluna != ignorar)
+
+    def partes(self, filtros) -> list:
+        """Pares (motor, filtros) cujas fatias, somadas, cobrem o período dos filtros"""
+        data_inicio, data_fim, selecoes = filtros
+        if data_inicio is None:
+            return [(self.motor, filtros)]
+
+        meses, bordas = dividir_periodo(data_inicio, data_fim)
+        partes = [(self.motor, (*meses, selecoes))] if meses else []
+        return partes + [(self.motor_borda(trecho), (None, None, selecoes)) for trecho in bordas]
+
+    def fatiar(self, filtros) -> pd.DataFrame:
+        """Células do cubo que atendem aos filtros"""
+        if not self.resolve_selecoes(filtros[2]):
+            return self.agregar(filtros)
+
+        fatias = [motor.dados.iloc[motor.filtrar(parte)] for motor, parte in self.partes(filtros)]
+        return fatias[0] if len(fatias) == 1 else combinar_lotes(fatias)
+
+    def contagens(self, filtros, coluna) -> pd.Series:
+        """Quantidade de ações por valor da coluna sob os filtros das demais colunas (facetas)"""
+        if coluna not in self.dados.columns or not self.resolve_selecoes(filtros[2], ignorar=coluna):
+            return self.contar(filtros, coluna)
+
+        total = None
+        for motor, parte in self.partes(filtros):
+            contagem = motor.contagens(parte, coluna)
+            total = contagem if total is None else total.add(contagem, fill_value=0)
+        return total.astype(np.int64)
+
+
+def motor_cubo_linhas(cubo: pd.DataFrame, motor: MotorFiltros) -> MotorCubo:
+    """MotorCubo que resolve bordas e seleções fora do cubo sobre as linhas do motor informado"""
+    return MotorCubo(
+        cubo,
+        agregar=lambda filtros: calcular_cubo(motor.dados.iloc[motor.filtrar(filtros)]),
+        contar=motor.contagens,
+    )
+
+
+def montar_filtros(date_range, selecoes: dict) -> tuple:
+    """Representação imutável (e cacheável) do estado dos filtros"""
+    inicio, fim = date_range if len(date_range) == 2 else (None, None)
+    return inicio, fim, tuple((coluna, tuple(valores)) for coluna, valores in selecoes.items() if valores)
+
+
+# Pesquisa
+def normalizar_texto(texto) -> str:
+    """Minúsculas e sem acentos, para comparação na pesquisa"""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def normalizar_coluna(serie: pd.Series) -> pd.Series:
+    """Versão normalizada de uma coluna, como texto alinhado ao índice original"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Normaliza só as categorias e expande pelos códigos (-1 aponta para o '' final)
+        categorias = [normalizar_texto(c) for c in serie.cat.categories] + ['']
+        valores = np.asarray(categorias, dtype=object)[serie.cat.codes.to_numpy()]
+        return pd.Series(valores, index=serie.index)
+
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        serie = serie.dt.strftime('%d/%m/%Y')
+
+    texto = serie.astype(str).where(serie.notna(), '')
+    texto = texto.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+    return texto.str.lower()
+
+
+def construir_indice_busca(df: pd.DataFrame) -> dict:
+    """Texto normalizado de cada coluna exibida e da linha inteira"""
+    indice = {coluna: normalizar_coluna(df[coluna]) for coluna in COLUNAS_EXIBICAO}
+
+    # Separador que não aparece em texto digitado evita casar termos entre colunas
+    linha = indice[COLUNAS_EXIBICAO[0]]
+    for coluna in COLUNAS_EXIBICAO[1:]:
+        linha = linha + '\x1f' + indice[coluna]
+    indice['Todas as colunas'] = linha
+
+    return indice
+
+
+def pesquisar(indice: dict, linhas, consulta: str, coluna: str = 'Todas as colunas') -> np.ndarray:
+    """Máscara das linhas que contêm todos os termos da consulta (E lógico)"""
+    texto = indice[coluna].loc[linhas]
+    mascara = pd.Series(True, index=texto.index)
+
+    for termo in normalizar_texto(consulta).split():
+        mascara &= texto.str.contains(termo, regex=False)
+
+    return mascara.to_numpy()
+
+
+# Consolidações das abas
+@dataclass(frozen=True)
+class VisaoGeral:
+    """Aba 1 - KPIs e consolidações mensais e por tipo"""
+    total_acoes: int
+    acoes_filtradas: int
+    total_pessoas: int
+    media_participantes: float
+    por_mes: pd.DataFrame
+    por_tipo: pd.DataFrame
+    indicadores: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class Categorias:
+    """Aba 2 - Rankings e tabela resumo por evento"""
+    ranking_acoes: pd.DataFrame
+    ranking_pessoas: pd.DataFrame
+    tabela_eventos: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class Regional:
+    """Aba 3 - Totais por contrato e por colaborador em cada contrato"""
+    por_contrato: pd.DataFrame
+    tabela_colaborador: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class Comunidade:
+    """Aba 4 - Linhas e KPIs das ações comunitárias (em ordem de data)"""
+    linhas: pd.DataFrame
+    acoes: int
+    pessoas: int
+    media_pessoas: float
+
+
+@dataclass(frozen=True)
+class DadosDetalhados:
+    """Aba 5 - Posições das linhas filtradas e contagens de valores distintos
+
+    No banco as linhas não são carregadas: posicoes é None e a grade consulta
+    só a página exibida.
+    """
+    posicoes: np.ndarray | None
+    registros: int
+    tipos: int
+    eventos: int
+    colaboradores: int
+
+
+def resumir_visao_geral(cubo: pd.DataFrame, cubo_filtrado: pd.DataFrame, indicadores: pd.DataFrame) -> VisaoGeral:
+    """KPIs do período filtrado (comparados ao total), evolução mensal e indicadores da série temporal"""
+    total_pessoas = int(cubo_filtrado['Total Pessoas'].sum())
+    qtd_pessoas = int(cubo_filtrado['Qtd Pessoas'].sum())
+
+    return VisaoGeral(
+        total_acoes=int(cubo['Qtd Ações'].sum()),
+        acoes_filtradas=int(cubo_filtrado['Qtd Ações'].sum()),
+        total_pessoas=total_pessoas,
+        media_participantes=total_pessoas / qtd_pessoas if qtd_pessoas else float('nan'),
+        por_mes=agregar_cubo(cubo_filtrado, ['Mês_Ordenacao', 'Mês_Nome']).sort_values('Mês_Ordenacao'),
+        por_tipo=agregar_cubo(cubo_filtrado, ['Tipo']).sort_values('Qtd Ações', ascending=False),
+        indicadores=indicadores,
+    )
+
+
+def resumir_categorias(cubo_filtrado: pd.DataFrame) -> Categorias:
+    """Top eventos por quantidade e por alcance, e a tabela resumo por evento"""
+    resumo_evento = agregar_cubo(cubo_filtrado, ['Evento'])
+
+    tabela_eventos = resumo_evento[['Evento', 'Total Pessoas', 'Média Pessoas', 'Qtd Ações']].round(1)
+
+    return Categorias(
+        ranking_acoes=resumo_evento.sort_values('Qtd Ações', ascending=False).head(LIMITE_RANKING),
+        ranking_pessoas=resumo_evento.sort_values('Total Pessoas', ascending=False).head(LIMITE_RANKING),
+        tabela_eventos=tabela_eventos.sort_values('Total Pessoas', ascending=False),
+    )
+
+
+def resumir_regional(cubo_filtrado: pd.DataFrame, por_colaborador: pd.DataFrame) -> Regional:
+    """Totais por contrato (do cubo) e desempenho de cada colaborador por contrato
+
+    `por_colaborador` traz as medidas do cubo por (Contrato, Colaborador) sob os
+    filtros: agregar_linhas das linhas filtradas ou o GROUP BY do banco.
+    """
+    tabela_colaborador = por_colaborador[['Contrato', 'Colaborador', 'Total Pessoas', 'Qtd Ações']].round(1)
+
+    return Regional(
+        por_contrato=agregar_cubo(cubo_filtrado, ['Contrato']),
+        tabela_colaborador=tabela_colaborador.sort_values('Total Pessoas', ascending=False),
+    )
+
+
+def resumir_comunidade(linhas: pd.DataFrame) -> Comunidade:
+    """KPIs das ações do tipo Comunidade dentre as linhas filtradas (em ordem de data)"""
+    pessoas = linhas['Pessoas Impactadas']
+
+    return Comunidade(
+        linhas=linhas,
+        acoes=len(linhas),
+        pessoas=int(pessoas.sum()),
+        media_pessoas=float(pessoas.mean()) if len(linhas) else float('nan'),
+    )
+
+
+def montar_dados_detalhados(df: pd.DataFrame, indexador) -> DadosDetalhados:
+    """Posições das linhas selecionadas pelo indexador e as contagens do cabeçalho"""
+    linhas = df.iloc[indexador]
+
+    return DadosDetalhados(
+        posicoes=np.arange(len(df))[indexador],
+        registros=len(linhas),
+        tipos=linhas['Tipo'].nunique(),
+        eventos=linhas['Evento'].nunique(),
+        colaboradores=linhas['Colaborador'].nunique(),
+    )
+
+
+def filtrar_faixa(df: pd.DataFrame, posicoes: np.ndarray, coluna: str, minimo=None, maximo=None) -> np.ndarray:
+    """Posições cujo valor numérico na coluna está entre mínimo e máximo (inclusive)"""
+    valores = df[coluna].to_numpy()[posicoes]
+    mascara = np.ones(len(posicoes), dtype=bool)
+
+    if minimo is not None:
+        mascara &= valores >= minimo
+    if maximo is not None:
+        mascara &= valores <= maximo
+
+    return posicoes[mascara]
+
+
+def chave_ordenacao(serie: pd.Series) -> np.ndarray:
+    """Valores comparáveis da coluna: códigos para categorias e texto (em ordem alfabética)
+
+    Calculada uma vez por base; o texto vira o posto de cada valor distinto,
+    para que ordenar a cada interação compare inteiros e não strings.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy()
+    if pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.to_numpy()
+    return pd.factorize(serie.astype(str).to_numpy(), sort=True)[0]
+
+
+def ordenar_posicoes(chaves: np.ndarray, posicoes: np.ndarray, decrescente: bool = False) -> np.ndarray:
+    """Posições ordenadas pela chave_ordenacao da coluna; empates mantêm a ordem original (ordem de data)"""
+    chaves = chaves.take(posicoes)
+
+    if not decrescente:
+        return posicoes[np.argsort(chaves, kind='stable')]
+
+    # Ordenação estável invertida: empates continuam na ordem original
+    ordem = len(chaves) - 1 - np.argsort(chaves[::-1], kind='stable')
+    return posicoes[ordem[::-1]]
+
+
+def formatar_pagina(df: pd.DataFrame, posicoes: np.ndarray) -> pd.DataFrame:
+    """Colunas de exibição das linhas informadas, com a data no formato brasileiro"""
+    pagina = df.iloc[posicoes][COLUNAS_EXIBICAO]
+    return pagina.assign(Data=pagina['Data'].dt.strftime('%d/%m/%Y'))
+
+
+# Exportação
+# Os exportadores recebem blocos com as COLUNAS_EXIBICAO (ao menos um, ainda que vazio),
+# vindos das posições de uma base em memória ou de uma consulta ao banco em partes.
+def blocos_exportacao(df: pd.DataFrame, posicoes: np.ndarray):
+    """Colunas de exibição das linhas informadas, em blocos de TAMANHO_BLOCO_EXPORTACAO"""
+    for inicio in range(0, max(len(posicoes), 1), TAMANHO_BLOCO_EXPORTACAO):
+        yield df.iloc[posicoes[inicio:inicio + TAMANHO_BLOCO_EXPORTACAO]][COLUNAS_EXIBICAO]
+
+
+def exportar_csv(blocos, destino: str) -> None:
+    """CSV (UTF-8 com BOM, datas dd/mm/aaaa) escrito bloco a bloco"""
+    with open(destino, 'w', encoding='utf-8-sig', newline='') as arquivo:
+        for numero, bloco in enumerate(blocos):
+            bloco.to_csv(arquivo, header=numero == 0, index=False, date_format='%d/%m/%Y')
+
+
+def exportar_parquet(blocos, destino: str) -> None:
+    """Parquet com tipos nativos (datas e categorias), um row group por bloco"""
+    escritor = None
+    try:
+        for bloco in blocos:
+            # Colunas de texto livre podem misturar tipos vindos do Excel; viram string
+            bloco = bloco.astype({coluna: 'string' for coluna in COLUNAS_EXIBICAO if bloco[coluna].dtype == object})
+            if escritor is None:
+                esquema = pa.Schema.from_pandas(bloco.iloc[:0], preserve_index=False)
+                escritor = pq.ParquetWriter(destino, esquema)
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def exportar_xlsx(blocos, destino: str) -> None:
+    """XLSX em modo write-only (linhas gravadas em sequência, sem manter a planilha em memória)"""
+    workbook = openpyxl.Workbook(write_only=True)
+    aba = workbook.create_sheet('Ações')
+    aba.append(COLUNAS_EXIBICAO)
+
+    def celula_data(valor):
+        celula = WriteOnlyCell(aba, value=valor.to_pydatetime() if pd.notna(valor) else None)
+        celula.number_format = 'DD/MM/YYYY'
+        return celula
+
+    gravadas = 0
+    for bloco in blocos:
+        gravadas += len(bloco)
+        if gravadas > LIMITE_LINHAS_XLSX:
+            aba.close()
+            raise ValueError(
+                f"O Excel aceita até {LIMITE_LINHAS_XLSX} linhas por aba; exporte em CSV ou Parquet"
+            )
+
+        for linha in bloco.astype({coluna: object for coluna in COLUNAS_EXIBICAO[1:]}).itertuples(index=False):
+            aba.append([celula_data(linha[0])] + [None if pd.isna(valor) else valor for valor in linha[1:]])
+
+    workbook.save(destino)
+
+
+# Formatos de exportação: rótulo -> (extensão, tipo MIME, função)
+FORMATOS_EXPORTACAO = {
+    'CSV': ('csv', 'text/csv', exportar_csv),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet', exportar_parquet),
+    'Excel (XLSX)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', exportar_xlsx),
+}
@@ -0,0 +1,476 @@
+"""Benchmark headless do dashboard SESMT
+
+Gera planilhas sintéticas com o esquema esperado (1 mil a 1 milhão de linhas)
+e cronometra cada etapa do dashboard sem abrir o navegador:
+
+- modo "etapas": chama os módulos analitico e graficos (sem Streamlit) e mede
+  leitura, processamento, snapshot, cubo, filtros, cada aba e a pesquisa;
+- modo "app": executa a página inteira no AppTest do Streamlit com o perfil de
+  desempenho ligado (SESMT_PERFIL) e coleta as etapas registradas por medir().
+
+O resultado é gravado em JSON e pode ser comparado com uma execução anterior:
+
+    python benchmarks/benchmark_dashboard.py --linhas 1000 10000 100000
+    python benchmarks/benchmark_dashboard.py --comparar benchmarks/resultados/anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+PASTA_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PASTA_PROJETO = os.path.dirname(PASTA_BENCHMARK)
+CAMINHO_SCRIPT = os.path.join(PASTA_PROJETO, 'acoessesmt.py')
+
+# Planilhas geradas ficam em cache; incrementar a versão ao mudar gerar_dados
+PASTA_DADOS = os.path.join(PASTA_BENCHMARK, '.dados')
+VERSAO_GERADOR = 1
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+
+# Variação mínima (s) para uma etapa mais lenta contar como regressão
+PISO_REGRESSAO = 0.005
+
+EVENTOS = [
+    'DDS', 'Treinamento NR10', 'Treinamento NR35', 'Campanha Dengue', 'Inspeção de Campo',
+    'Palestra Ação Comunitária', 'Blitz EPI', 'SIPAT', 'Simulado de Emergência', 'Auditoria Interna',
+    'Campanha Outubro Rosa', 'Campanha Novembro Azul', 'Visita Escola', 'Ginástica Laboral',
+    'Diálogo de Segurança', 'Integração de Novos Colaboradores',
+]
+TIPOS = ['Interno', 'Treinamento', 'Comunidade', 'EQTL']
+CONTRATOS = ['Oeste', 'Nordeste', 'Sul', 'Norte', 'Centro', 'Litoral']
+CARGOS = ['Técnico de Segurança', 'Engenheiro de Segurança', 'Supervisor', 'Encarregado', 'Enfermeiro do Trabalho']
+OBSERVACOES = [
+    'Realizado conforme planejado', 'Chuva forte reduziu a participação', 'Participação ótima da equipe',
+    'Reforçado o uso de EPI', 'Ação em parceria com a prefeitura', 'Reprogramado por falta de energia', '',
+]
+NOMES = ['João', 'Maria', 'José', 'Ana', 'Carlos', 'Francisca', 'Paulo', 'Luiza', 'Pedro', 'Joana']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes']
+
+
+def gerar_dados(linhas, semente=0):
+    """DataFrame sintético com as colunas e cardinalidades típicas da planilha"""
+    rng = np.random.default_rng(semente)
+    colaboradores = np.array([
+        f"{nome} {sobrenome} {i}" for i, (nome, sobrenome) in
+        enumerate((n, s) for n in NOMES for s in SOBRENOMES)
+    ] * 4)[:max(10, min(400, linhas // 50))]
+
+    observacoes = np.array(OBSERVACOES, dtype=object)[rng.integers(0, len(OBSERVACOES), linhas)]
+    detalhadas = rng.random(linhas) < 0.2
+    observacoes[detalhadas] = [f"Registro {i} com detalhes adicionais" for i in np.flatnonzero(detalhadas)]
+
+    return pd.DataFrame({
+        'Data': pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, linhas), unit='D'),
+        'Evento': rng.choice(EVENTOS, linhas),
+        'Pessoas Impactadas': rng.integers(1, 300, linhas),
+        'Observações': observacoes,
+        'Colaborador': rng.choice(colaboradores, linhas),
+        'Cargo': rng.choice(CARGOS, linhas),
+        'Contrato': rng.choice(CONTRATOS, linhas),
+        'Tipo': rng.choice(TIPOS, linhas, p=[0.35, 0.3, 0.2, 0.15]),
+    })
+
+
+def obter_planilha(linhas, semente=0):
+    """Caminho da planilha sintética, gerada (modo write-only) só na primeira vez"""
+    caminho = os.path.join(PASTA_DADOS, f"sesmt_{linhas}_s{semente}_v{VERSAO_GERADOR}.xlsx")
+    if os.path.exists(caminho):
+        return caminho
+
+    os.makedirs(PASTA_DADOS, exist_ok=True)
+    dados = gerar_dados(linhas, semente)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    aba = workbook.create_sheet('Ações')
+    aba.append(list(dados.columns))
+    for linha in dados.itertuples(index=False, name=None):
+        aba.append([
+            valor.to_pydatetime() if isinstance(valor, pd.Timestamp)
+            else valor.item() if isinstance(valor, np.generic) else valor
+            for valor in linha
+        ])
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    workbook.save(temporario)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def cronometrar(funcao, repeticoes):
+    """Tempos (s) de cada repetição e o último resultado da função"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+
+def tamanho_resultado(resultado):
+    """Quantidade de linhas (ou itens) produzida por uma etapa"""
+    if isinstance(resultado, slice):
+        return resultado.stop - resultado.start
+    if isinstance(resultado, (tuple, list)):
+        return tamanho_resultado(resultado[0])
+    if isinstance(resultado, np.ndarray) and resultado.dtype == bool:
+        return int(resultado.sum())
+    return len(resultado) if hasattr(resultado, '__len__') else None
+
+
+def importar_nucleo():
+    """Módulos analitico e graficos (importados depois de configurar SESMT_SNAPSHOT_DIR)"""
+    sys.path.insert(0, PASTA_PROJETO)
+    import analitico
+    import graficos
+    return analitico, graficos
+
+
+def filtros_tipicos(analitico, df):
+    """Últimos 12 meses, dois tipos de ação e três contratos"""
+    data_fim = df['Data'].max()
+    data_inicio = data_fim - pd.DateOffset(months=12)
+    return analitico.montar_filtros(
+        (data_inicio.date(), data_fim.date()),
+        {'Tipo': ['Comunidade', 'Treinamento'], 'Contrato': CONTRATOS[:3]}
+    )
+
+
+def etapas_dashboard(conteudo):
+    """Etapas medidas no modo headless, na ordem em que a página as executa
+
+    Cada etapa é (nome, função). As funções leem e gravam em 'estado', de modo
+    que cada uma recebe a saída da anterior.
+    """
+    analitico, graficos = importar_nucleo()
+    estado = {}
+
+    def leitura():
+        estado['bruto'], estado['quarentena'] = analitico.ler_planilha(conteudo)
+        return estado['bruto']
+
+    def processamento():
+        estado['df'] = analitico.processar_dados(estado['bruto'].copy())
+        return estado['df']
+
+    def gravacao_snapshot():
+        analitico.salvar_snapshot('benchmark', estado['df'])
+        return estado['df']
+
+    def leitura_snapshot():
+        return analitico.ler_snapshot('benchmark')
+
+    def cubo():
+        estado['cubo'] = analitico.calcular_cubo(estado['df'])
+        return estado['cubo']
+
+    def serie_temporal():
+        estado['serie'] = analitico.construir_serie_temporal(estado['df'])
+        return estado['serie'].diario
+
+    def atualizacao_serie():
+        # Último mês chegando depois do restante da base
+        df = estado['df']
+        corte = df['Data'].searchsorted(df['Data'].iloc[-1].to_period('M').start_time)
+        anterior = analitico.construir_serie_temporal(df.iloc[:corte])
+        return analitico.atualizar_serie_temporal(anterior, df.iloc[corte:]).mensal
+
+    def filtros():
+        df, cubo_completo = estado['df'], estado['cubo']
+        filtros_estado = filtros_tipicos(analitico, df)
+        estado['motor'] = motor = analitico.MotorFiltros(df)
+        estado['motor_cubo'] = motor_cubo = analitico.motor_cubo_linhas(cubo_completo, motor)
+        estado['filtros'] = filtros_estado
+
+        estado['indexador'] = motor.filtrar(filtros_estado)
+        estado['df_filtrado'] = df.iloc[estado['indexador']]
+        estado['cubo_filtrado'] = motor_cubo.fatiar(filtros_estado)
+        for coluna in analitico.COLUNAS_DIMENSAO:
+            motor_cubo.contagens(filtros_estado, coluna)
+        return estado['df_filtrado']
+
+    def aba_visao_geral():
+        mensal = analitico.mensal_dos_filtros(estado['serie'], estado['motor_cubo'], estado['filtros'])
+        indicadores = analitico.indicadores_mensais(estado['serie'], mensal, estado['filtros'])
+        resumo = analitico.resumir_visao_geral(estado['cubo'], estado['cubo_filtrado'], indicadores)
+        graficos.figuras_visao_geral(resumo)
+        return resumo.por_mes
+
+    def aba_categorias():
+        resumo = analitico.resumir_categorias(estado['cubo_filtrado'])
+        graficos.figuras_categorias(resumo)
+        return resumo.tabela_eventos
+
+    def aba_regional():
+        resumo = analitico.resumir_regional(
+            estado['cubo_filtrado'], analitico.agregar_linhas(estado['df_filtrado'], ['Contrato', 'Colaborador'])
+        )
+        graficos.figuras_regional(resumo)
+        return resumo.tabela_colaborador
+
+    def aba_comunidade():
+        resumo = analitico.resumir_comunidade(
+            estado['df'].iloc[estado['motor'].restringir(estado['indexador'], 'Tipo', 'Comunidade')]
+        )
+        graficos.figura_comunidade(resumo)
+        return resumo.linhas
+
+    def aba_dados():
+        # Grade paginada: ordenação das posições e formatação só da primeira página
+        detalhes = analitico.montar_dados_detalhados(estado['df'], estado['indexador'])
+        chaves = analitico.chave_ordenacao(estado['df']['Pessoas Impactadas'])
+        posicoes = analitico.ordenar_posicoes(chaves, detalhes.posicoes, True)
+        analitico.formatar_pagina(estado['df'], posicoes[:50])
+        return posicoes
+
+    def abas_em_paralelo():
+        # Mesmos cálculos das cinco abas enviados a um pool, como no dashboard
+        abas = [aba_visao_geral, aba_categorias, aba_regional, aba_comunidade, aba_dados]
+        with ThreadPoolExecutor(max_workers=len(abas)) as executor:
+            return [futuro.result() for futuro in [executor.submit(aba) for aba in abas]]
+
+    def indice_busca():
+        estado['indice'] = analitico.construir_indice_busca(estado['df'])
+        return estado['indice']['Todas as colunas']
+
+    def pesquisa():
+        return analitico.pesquisar(estado['indice'], estado['df_filtrado'].index, 'registro detalhes')
+
+    return [
+        ('leitura da planilha', leitura),
+        ('processar_dados', processamento),
+        ('gravação do snapshot', gravacao_snapshot),
+        ('leitura do snapshot', leitura_snapshot),
+        ('cubo de agregados', cubo),
+        ('série temporal', serie_temporal),
+        ('atualização incremental da série', atualizacao_serie),
+        ('filtros e facetas', filtros),
+        ('aba: Visão Geral', aba_visao_geral),
+        ('aba: Análise por Categoria', aba_categorias),
+        ('aba: Análise Regional', aba_regional),
+        ('aba: Ações Comunitárias', aba_comunidade),
+        ('aba: Dados Detalhados', aba_dados),
+        ('abas em paralelo', abas_em_paralelo),
+        ('índice de busca', indice_busca),
+        ('pesquisa', pesquisa),
+    ]
+
+
+def medir_etapas(linhas, caminho, repeticoes):
+    """Mede as etapas do dashboard chamando as funções do núcleo analítico"""
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    resultados = []
+    for etapa, funcao in etapas_dashboard(conteudo):
+        # Leitura do Excel é a etapa mais lenta e menos ruidosa: uma repetição basta
+        tempos, resultado = cronometrar(funcao, 1 if etapa == 'leitura da planilha' else repeticoes)
+        resultados.append(resumir_tempos('etapas', linhas, etapa, tempos, tamanho_resultado(resultado)))
+        print(f"  {etapa:<30} {statistics.median(tempos):9.4f} s", flush=True)
+
+    return resultados
+
+
+# Roteiro executado pelo AppTest: o uploader devolve as planilhas do benchmark
+ROTEIRO_APP = """
+import io, os, runpy, sys
+import streamlit as st
+
+class ArquivoEnviado(io.BytesIO):
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            super().__init__(arquivo.read())
+        self.name = self.file_id = os.path.basename(caminho)
+        self.size, self.type = len(self.getvalue()), 'application/vnd.ms-excel'
+
+_uploader = st.file_uploader
+
+def file_uploader(*args, **kwargs):
+    _uploader(*args, **kwargs)
+    return [ArquivoEnviado(caminho) for caminho in os.environ['SESMT_BENCHMARK_ARQUIVOS'].split(os.pathsep)]
+
+st.file_uploader = file_uploader
+
+# Como no streamlit run, a pasta do script entra no sys.path (módulos analitico e graficos)
+sys.path.insert(0, os.path.dirname(os.environ['SESMT_BENCHMARK_SCRIPT']))
+runpy.run_path(os.environ['SESMT_BENCHMARK_SCRIPT'], run_name='__main__')
+"""
+
+
+def medir_app(linhas, caminho, repeticoes, tempo_limite):
+    """Executa a página no AppTest e coleta as etapas do perfil de desempenho
+
+    A primeira execução é fria (sem snapshot nem caches); as seguintes medem
+    reruns com caches aquecidos, como a interação de um usuário.
+    """
+    import streamlit.logger
+    from streamlit.testing.v1 import AppTest
+
+    # O AppTest roda a página fora de um servidor; os avisos de contexto são esperados
+    streamlit.logger.set_log_level('error')
+
+    os.environ.update({
+        'SESMT_PERFIL': '1',
+        'SESMT_BENCHMARK_ARQUIVOS': caminho,
+        'SESMT_BENCHMARK_SCRIPT': CAMINHO_SCRIPT,
+    })
+
+    app_teste = AppTest.from_string(ROTEIRO_APP, default_timeout=tempo_limite)
+    execucoes = {}
+    for repeticao in range(repeticoes + 1):
+        inicio = time.perf_counter()
+        app_teste.run()
+        total = time.perf_counter() - inicio
+
+        if app_teste.exception:
+            raise RuntimeError(app_teste.exception[0].message)
+
+        cenario = 'app (fria)' if repeticao == 0 else 'app (rerun)'
+        registros = execucoes.setdefault(cenario, {})
+        registros.setdefault('execução completa', []).append((total, linhas))
+
+        # Etapas repetidas numa execução (ex.: várias figuras do mesmo tipo) são somadas
+        execucao = {}
+        for registro in app_teste.session_state['perfil_execucao']:
+            segundos, _ = execucao.get(registro['etapa'], (0.0, None))
+            execucao[registro['etapa']] = (segundos + registro['segundos'], registro['linhas'])
+        for etapa, medicao in execucao.items():
+            registros.setdefault(etapa, []).append(medicao)
+
+    resultados = []
+    for cenario, registros in execucoes.items():
+        for etapa, medicoes in registros.items():
+            tempos = [segundos for segundos, _ in medicoes]
+            resultados.append(resumir_tempos(cenario, linhas, etapa, tempos, medicoes[-1][1]))
+            print(f"  {cenario:<12} {etapa:<30} {statistics.median(tempos):9.4f} s", flush=True)
+
+    return resultados
+
+
+def resumir_tempos(modo, linhas, etapa, tempos, linhas_saida):
+    """Registro comparável de uma etapa"""
+    return {
+        'modo': modo,
+        'linhas': linhas,
+        'etapa': etapa,
+        'mediana_s': round(statistics.median(tempos), 6),
+        'minimo_s': round(min(tempos), 6),
+        'repeticoes': len(tempos),
+        'linhas_saida': linhas_saida,
+    }
+
+
+def metadados(argumentos):
+    """Ambiente da execução, para saber se dois resultados são comparáveis"""
+    import plotly
+    import streamlit
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_PROJETO,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'momento': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'processadores': os.cpu_count(),
+        'versoes': {
+            'pandas': pd.__version__, 'numpy': np.__version__,
+            'streamlit': streamlit.__version__, 'plotly': plotly.__version__,
+        },
+        'semente': argumentos.semente,
+        'repeticoes': argumentos.repeticoes,
+    }
+
+
+def comparar(atual, anterior, tolerancia):
+    """Imprime a variação por etapa e devolve as regressões acima da tolerância"""
+    referencia = {(r['modo'], r['linhas'], r['etapa']): r for r in anterior['resultados']}
+    regressoes = []
+
+    print(f"\nComparação com {anterior['metadados'].get('commit')} ({anterior['metadados']['momento']})")
+    print(f"{'modo':<12} {'linhas':>9} {'etapa':<30} {'antes':>9} {'agora':>9} {'variação':>9}")
+    for resultado in atual['resultados']:
+        chave = (resultado['modo'], resultado['linhas'], resultado['etapa'])
+        if chave not in referencia:
+            continue
+
+        antes, agora = referencia[chave]['mediana_s'], resultado['mediana_s']
+        variacao = (agora - antes) / antes if antes else 0.0
+        regressao = variacao > tolerancia and agora - antes > PISO_REGRESSAO
+        if regressao:
+            regressoes.append(chave)
+
+        print(
+            f"{chave[0]:<12} {chave[1]:>9} {chave[2]:<30} {antes:9.4f} {agora:9.4f} "
+            f"{variacao:+8.1%}{' ⚠' if regressao else ''}"
+        )
+
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help='tamanhos das planilhas sintéticas')
+    parser.add_argument('--modo', choices=['etapas', 'app', 'ambos'], default='etapas',
+                        help='etapas: funções chamadas diretamente; app: página inteira no AppTest')
+    parser.add_argument('--repeticoes', type=int, default=5, help='repetições de cada etapa')
+    parser.add_argument('--semente', type=int, default=0, help='semente do gerador de dados')
+    parser.add_argument('--saida', help='arquivo JSON do resultado (padrão: benchmarks/resultados/<momento>.json)')
+    parser.add_argument('--comparar', help='resultado anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='aumento relativo da mediana considerado regressão (0.2 = 20%%)')
+    parser.add_argument('--tempo-limite', type=float, default=600, help='tempo máximo (s) de uma execução no AppTest')
+    argumentos = parser.parse_args()
+
+    # Snapshots do benchmark não se misturam aos do dashboard
+    os.environ['SESMT_SNAPSHOT_DIR'] = tempfile.mkdtemp(prefix='sesmt_benchmark_')
+    os.environ.pop('SESMT_DB_PATH', None)
+
+    resultados = []
+    for linhas in argumentos.linhas:
+        print(f"\n{linhas} linhas", flush=True)
+        caminho = obter_planilha(linhas, argumentos.semente)
+
+        if argumentos.modo in ('etapas', 'ambos'):
+            resultados += medir_etapas(linhas, caminho, argumentos.repeticoes)
+        if argumentos.modo in ('app', 'ambos'):
+            resultados += medir_app(linhas, caminho, argumentos.repeticoes, argumentos.tempo_limite)
+
+    atual = {'metadados': metadados(argumentos), 'resultados': resultados}
+
+    saida = argumentos.saida or os.path.join(
+        PASTA_BENCHMARK, 'resultados', f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(atual, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultado gravado em {saida}")
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(atual, json.load(arquivo), argumentos.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} etapa(s) mais lenta(s) que a tolerância de {argumentos.tolerancia:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
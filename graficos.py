@@ -0,0 +1,205 @@
+"""Gráficos Plotly do BI SESMT
+
+Recebem os DataFrames consolidados do módulo analitico e devolvem figuras com o
+template da empresa, prontas para o dashboard ou para exportação em HTML.
+"""
+import functools
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Cores da empresa
+COR_PRINCIPAL = "#000000"
+COR_SECUNDARIA = "#F7931E"
+COR_FUNDO = "#FFFFFF"
+COR_TEXTO = "#333333"
+
+# Timeline comunitária: a partir de quantos pontos usar WebGL e quantos rótulos exibir
+LIMITE_WEBGL_TIMELINE = 1000
+LIMITE_ROTULOS_TIMELINE = 60
+
+
+def criar_layout_cores():
+    """Retorna configuração de layout para gráficos Plotly"""
+    return dict(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(family="Poppins, sans-serif", color=COR_TEXTO),
+        title_font=dict(size=20, color=COR_PRINCIPAL, family="Poppins, sans-serif"),
+        hoverlabel=dict(bgcolor="white", font_size=12, font_family="Poppins"),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def obter_template():
+    """Template Plotly da empresa (padrão do Plotly + cores e fontes de criar_layout_cores)"""
+    template = go.layout.Template(pio.templates['plotly'])
+    template.layout.update(criar_layout_cores())
+    return template
+
+
+def figura_linha_mensal(dados, y, titulo):
+    """Linha com marcadores ao longo dos meses"""
+    figura = px.line(dados, x='Mês_Nome', y=y, title=titulo, markers=True, template=obter_template())
+    figura.update_traces(
+        line_color=COR_SECUNDARIA,
+        line_width=3,
+        marker=dict(size=10, color=COR_SECUNDARIA)
+    )
+    return figura
+
+
+def figura_barras_mensal(dados, y, titulo):
+    """Barras na cor da empresa ao longo dos meses"""
+    return px.bar(
+        dados, x='Mês_Nome', y=y, title=titulo,
+        color_discrete_sequence=[COR_SECUNDARIA], template=obter_template()
+    )
+
+
+def figura_janelas_moveis(dados, medida, titulo):
+    """Linhas das somas móveis de 3 e 12 meses da medida ao longo dos meses"""
+    figura = go.Figure(layout=dict(template=obter_template(), title=titulo))
+    for janela, cor in (('3M', COR_SECUNDARIA), ('12M', COR_PRINCIPAL)):
+        figura.add_trace(go.Scatter(
+            x=dados['Mês_Nome'], y=dados[f'{medida} {janela}'], name=f'Últimos {janela[:-1]} meses',
+            mode='lines+markers', line=dict(color=cor, width=3)
+        ))
+    return figura
+
+
+def figura_pizza(dados, valores, nomes, titulo):
+    """Pizza com percentual e rótulo dentro das fatias"""
+    figura = px.pie(
+        dados, values=valores, names=nomes, title=titulo,
+        color_discrete_sequence=[COR_SECUNDARIA, '#ff9d3d', '#ffb366', '#ffc999'],
+        template=obter_template()
+    )
+    figura.update_traces(textposition='inside', textinfo='percent+label')
+    return figura
+
+
+def figura_barras_gradiente(dados, x, y, titulo, orientacao='v'):
+    """Barras coloridas pelo valor, do preto ao laranja da empresa"""
+    valor = x if orientacao == 'h' else y
+    return px.bar(
+        dados, x=x, y=y, orientation=orientacao, title=titulo,
+        color=valor, color_continuous_scale=[[0, COR_PRINCIPAL], [1, COR_SECUNDARIA]],
+        template=obter_template()
+    )
+
+
+def criar_timeline_comunidade(df_comunidade):
+    """Timeline das ações comunitárias em um único trace com dados colunares"""
+    eventos = df_comunidade['Evento'].astype(str)
+    pessoas = df_comunidade['Pessoas Impactadas']
+
+    # Com muitos pontos, só as ações de maior alcance recebem rótulo
+    rotulos = eventos.str.slice(0, 30) + '...'
+    if len(rotulos) > LIMITE_ROTULOS_TIMELINE:
+        destaques = pessoas.nlargest(LIMITE_ROTULOS_TIMELINE).index
+        rotulos = rotulos.where(rotulos.index.isin(destaques), '')
+
+    dados_hover = np.column_stack([eventos, df_comunidade['Data'].dt.strftime('%d/%m/%Y')])
+
+    classe_trace = go.Scattergl if len(df_comunidade) > LIMITE_WEBGL_TIMELINE else go.Scatter
+
+    figura = go.Figure(classe_trace(
+        x=df_comunidade['Data'],
+        y=pessoas,
+        mode='markers+text',
+        marker=dict(size=15, color=COR_SECUNDARIA),
+        text=rotulos,
+        textposition='top center',
+        customdata=dados_hover,
+        hovertemplate="<b>%{customdata[0]}</b><br>" +
+                      "Data: %{customdata[1]}<br>" +
+                      "Pessoas: %{y}<br>" +
+                      "<extra></extra>"
+    ))
+
+    figura.update_layout(
+        title='Timeline de Ações Comunitárias',
+        xaxis_title='Data',
+        yaxis_title='Pessoas Impactadas',
+        showlegend=False,
+        template=obter_template()
+    )
+    return figura
+
+
+# Figuras das abas
+# Recebem as consolidações do módulo analitico. 'construir' permite ao chamador
+# memoizar cada figura (o dashboard usa o cache de figuras da sessão).
+def construir_figura(construtor, dados, **opcoes):
+    """Constrói a figura diretamente, sem cache"""
+    return construtor(dados, **opcoes)
+
+
+def figuras_visao_geral(resumo, construir=construir_figura):
+    """Aba 1: evolução mensal de ações e pessoas, distribuição por tipo e janelas móveis"""
+    acoes_por_mes = resumo.por_mes.rename(columns={'Qtd Ações': 'Quantidade'})
+    pessoas_por_mes = resumo.por_mes.rename(columns={'Total Pessoas': 'Pessoas Impactadas'})
+    tipo_dist = resumo.por_tipo.rename(columns={'Qtd Ações': 'Quantidade'})
+
+    return (
+        construir(
+            figura_linha_mensal, acoes_por_mes[['Mês_Nome', 'Quantidade']],
+            y='Quantidade', titulo='Evolução de Ações ao Longo do Tempo'
+        ),
+        construir(
+            figura_barras_mensal, pessoas_por_mes[['Mês_Nome', 'Pessoas Impactadas']],
+            y='Pessoas Impactadas', titulo='Pessoas Impactadas por Mês'
+        ),
+        construir(
+            figura_pizza, tipo_dist[['Tipo', 'Quantidade']],
+            valores='Quantidade', nomes='Tipo', titulo='Distribuição de Ações por Tipo'
+        ),
+        construir(
+            figura_janelas_moveis, resumo.indicadores[['Mês_Nome', 'Qtd Ações 3M', 'Qtd Ações 12M']],
+            medida='Qtd Ações', titulo='Ações em Janelas Móveis'
+        ),
+    )
+
+
+def figuras_categorias(resumo, construir=construir_figura):
+    """Aba 2: rankings de eventos por quantidade e por alcance"""
+    eventos_ranking = resumo.ranking_acoes.rename(columns={'Qtd Ações': 'Quantidade'})
+    pessoas_por_evento = resumo.ranking_pessoas.rename(columns={'Total Pessoas': 'Pessoas Impactadas'})
+
+    return (
+        construir(
+            figura_barras_gradiente, eventos_ranking[['Evento', 'Quantidade']],
+            x='Quantidade', y='Evento', titulo='Top 10 Eventos Mais Realizados', orientacao='h'
+        ),
+        construir(
+            figura_barras_gradiente, pessoas_por_evento[['Evento', 'Pessoas Impactadas']],
+            x='Pessoas Impactadas', y='Evento', titulo='Top 10 Eventos com Maior Alcance', orientacao='h'
+        ),
+    )
+
+
+def figuras_regional(resumo, construir=construir_figura):
+    """Aba 3: ações e pessoas impactadas por região"""
+    acoes_regiao = resumo.por_contrato.rename(columns={'Qtd Ações': 'Quantidade'})
+    pessoas_regiao = resumo.por_contrato.rename(columns={'Total Pessoas': 'Pessoas Impactadas'})
+
+    return (
+        construir(
+            figura_barras_gradiente, acoes_regiao[['Contrato', 'Quantidade']],
+            x='Contrato', y='Quantidade', titulo='Ações Realizadas por Região'
+        ),
+        construir(
+            figura_barras_gradiente, pessoas_regiao[['Contrato', 'Pessoas Impactadas']],
+            x='Contrato', y='Pessoas Impactadas', titulo='Pessoas Impactadas por Região'
+        ),
+    )
+
+
+def figura_comunidade(resumo, construir=construir_figura):
+    """Aba 4: timeline das ações comunitárias (None quando não há ações)"""
+    if resumo.acoes == 0:
+        return None
+    return construir(criar_timeline_comunidade, resumo.linhas[['Data', 'Evento', 'Pessoas Impactadas']])
@@ -0,0 +1,223 @@
+"""Ingestão de planilhas em disco e pasta monitorada
+
+O MonitorPasta verifica periodicamente uma pasta local. Quando planilhas são
+adicionadas, alteradas ou removidas, ele relê só os arquivos afetados,
+atualiza a base combinada e publica uma nova BaseCompartilhada trocando uma
+única referência. Leitores obtêm a versão vigente em `monitor.atual` e nunca
+veem uma base pela metade.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+from analitico import (
+    SerieTemporal, anexar_ineditos, atualizar_serie_temporal, calcular_cubo, chave_quarentena, chaves_registro,
+    combinar_lotes, combinar_quarentenas, construir_serie_temporal, ler_planilha, ler_snapshot, processar_dados,
+    salvar_snapshot,
+)
+
+# Extensões consideradas na pasta monitorada
+EXTENSOES_PLANILHA = ('.xlsx',)
+
+# Arquivos modificados há menos tempo que isto ainda podem estar sendo copiados
+ESTABILIZACAO_S = 2.0
+
+
+# Leitura de arquivos
+def chave_conteudo(conteudo: bytes) -> str:
+    """Hash do conteúdo que identifica a planilha (caches, snapshots e banco)"""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def carregar_conteudo(conteudo: bytes) -> tuple:
+    """(hash do conteúdo, DataFrame processado, linhas em quarentena), reaproveitando os snapshots"""
+    chave = chave_conteudo(conteudo)
+
+    df, quarentena = ler_snapshot(chave), ler_snapshot(chave_quarentena(chave))
+    if df is None or quarentena is None:
+        df, quarentena = ler_planilha(conteudo)
+        df = processar_dados(df)
+        salvar_snapshot(chave, df)
+        salvar_snapshot(chave_quarentena(chave), quarentena)
+    return chave, df, quarentena
+
+
+def carregar_arquivo(caminho: str) -> tuple:
+    """carregar_conteudo de uma planilha em disco"""
+    with open(caminho, 'rb') as arquivo:
+        return carregar_conteudo(arquivo.read())
+
+
+def combinar_planilhas(entradas: list, base: pd.DataFrame | None = None, chaves=None) -> tuple:
+    """Anexa à base as linhas inéditas das planilhas; registros repetidos são descartados
+
+    Sem base, as planilhas são combinadas entre si e uma planilha só é
+    devolvida como está. Com ela, `chaves` são as chaves de registro que a
+    base já contém (calculadas da base quando omitidas). Retorna
+    (df, anexadas, chaves, duplicadas): a base combinada, as linhas anexadas,
+    as chaves de registro da base combinada (None para uma planilha só) e
+    quantos registros foram descartados.
+    """
+    if base is None and len(entradas) == 1:
+        return entradas[0], entradas[0], None, 0
+    if base is not None and chaves is None:
+        chaves = chaves_registro(base)
+
+    partes, chaves, duplicadas = anexar_ineditos(entradas, chaves)
+    df = processar_dados(combinar_lotes(([base] if base is not None else []) + partes))
+    return df, combinar_lotes(partes), chaves, duplicadas
+
+
+# Pasta monitorada
+@dataclass(frozen=True)
+class BaseCompartilhada:
+    """Versão publicada da base da pasta monitorada (somente leitura)"""
+    versao: int
+    chave: str
+    df: pd.DataFrame
+    cubo: pd.DataFrame
+    serie: SerieTemporal
+    quarentena: pd.DataFrame
+    arquivos: tuple
+    duplicadas: int
+    atualizada_em: datetime
+
+
+class MonitorPasta:
+    """Mantém a base combinada das planilhas de uma pasta, atualizada em segundo plano
+
+    Cada arquivo é relido apenas quando seu tamanho ou data de modificação
+    mudam. Uma falha de leitura (arquivo corrompido ou ainda sendo copiado)
+    mantém a versão anterior publicada e é registrada em `erro`; o arquivo é
+    tentado de novo na verificação seguinte.
+    """
+
+    def __init__(self, pasta: str, intervalo: float = 30.0):
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self.atual = None
+        self.erro = None
+        self._arquivos = {}
+        self._chaves = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def listar(self) -> dict:
+        """{caminho: (mtime, tamanho)} das planilhas estáveis da pasta"""
+        limite = time.time() - ESTABILIZACAO_S
+        arquivos = {}
+        with os.scandir(self.pasta) as entradas:
+            for entrada in entradas:
+                # '~$' são arquivos de bloqueio do Excel
+                if not entrada.is_file() or entrada.name.startswith('~$'):
+                    continue
+                if not entrada.name.lower().endswith(EXTENSOES_PLANILHA):
+                    continue
+                estado = entrada.stat()
+                if estado.st_mtime < limite:
+                    arquivos[entrada.path] = (estado.st_mtime_ns, estado.st_size)
+        return arquivos
+
+    def verificar(self) -> bool:
+        """Relê os arquivos alterados e publica uma nova versão; retorna se houve troca"""
+        with self._lock:
+            encontrados = self.listar()
+            vigentes = {caminho: entrada[0] for caminho, entrada in self._arquivos.items()}
+            if encontrados == vigentes:
+                return False
+
+            arquivos = {}
+            falhas = []
+            for caminho, assinatura in sorted(encontrados.items()):
+                anterior = self._arquivos.get(caminho)
+                if anterior is not None and anterior[0] == assinatura:
+                    arquivos[caminho] = anterior
+                    continue
+                try:
+                    arquivos[caminho] = (assinatura, *carregar_arquivo(caminho))
+                except Exception as erro:
+                    falhas.append(f"{os.path.basename(caminho)}: {erro}")
+                    if anterior is not None:
+                        arquivos[caminho] = anterior
+
+            self.erro = '; '.join(falhas) or None
+            if arquivos.keys() == self._arquivos.keys() and all(
+                arquivos[caminho] is self._arquivos[caminho] for caminho in arquivos
+            ):
+                return False
+
+            self.atual = self.montar_base(arquivos)
+            self._arquivos = arquivos
+            return True
+
+    def montar_base(self, arquivos: dict) -> BaseCompartilhada | None:
+        """Nova versão da base com os arquivos em ordem de nome
+
+        Quando os arquivos vigentes continuam inalterados e só há arquivos
+        novos, apenas as linhas inéditas deles são anexadas à base publicada
+        (depois das vigentes) e a série temporal é atualizada só com elas.
+        Alterações e remoções recombinam todos os arquivos.
+        """
+        if not arquivos:
+            self._chaves = None
+            return None
+
+        caminhos = sorted(arquivos)
+        novos = [caminho for caminho in caminhos if caminho not in self._arquivos]
+        incremental = self.atual is not None and all(
+            arquivos.get(caminho) is entrada for caminho, entrada in self._arquivos.items()
+        )
+
+        if incremental:
+            df, anexadas, self._chaves, descartadas = combinar_planilhas(
+                [arquivos[caminho][2] for caminho in novos], self.atual.df, self._chaves
+            )
+            duplicadas = self.atual.duplicadas + descartadas
+            serie = atualizar_serie_temporal(self.atual.serie, anexadas)
+        else:
+            df, _, self._chaves, duplicadas = combinar_planilhas([arquivos[caminho][2] for caminho in caminhos])
+            serie = construir_serie_temporal(df)
+
+        return BaseCompartilhada(
+            versao=(self.atual.versao + 1) if self.atual is not None else 1,
+            chave=hashlib.sha256('|'.join(arquivos[caminho][1] for caminho in caminhos).encode()).hexdigest(),
+            df=df,
+            cubo=calcular_cubo(df),
+            serie=serie,
+            quarentena=combinar_quarentenas(
+                {os.path.basename(caminho): arquivos[caminho][3] for caminho in caminhos}
+            ),
+            arquivos=tuple(os.path.basename(caminho) for caminho in caminhos),
+            duplicadas=duplicadas,
+            atualizada_em=datetime.now(),
+        )
+
+    def executar(self):
+        """Laço da thread de monitoramento"""
+        while not self._parar.is_set():
+            try:
+                self.verificar()
+            except Exception as erro:
+                # Pasta inacessível: mantém a versão publicada e tenta de novo no próximo ciclo
+                self.erro = str(erro)
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self) -> 'MonitorPasta':
+        """Inicia a thread de monitoramento (a primeira verificação é imediata)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.executar, name='monitor-pasta', daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        """Encerra a thread de monitoramento"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,320 @@
+"""Relatórios estáticos do BI SESMT por contrato, sem Streamlit
+
+Lê uma ou mais planilhas de acompanhamento, combina os registros como o
+dashboard e gera, para cada contrato, uma pasta com um HTML autocontido (KPIs,
+gráficos das abas e tabelas resumo) e, opcionalmente, os gráficos em PDF. Um
+index.html na pasta de saída lista os contratos gerados.
+
+    python relatorio.py planilha.xlsx outra.xlsx --saida relatorios
+    python relatorio.py planilha.xlsx --contratos Sul Oeste --inicio 2024-01-01 --fim 2024-12-31 --pdf
+
+Os contratos são gerados em paralelo, um processo por contrato. O PDF usa a
+exportação estática do Plotly e requer o pacote kaleido.
+"""
+import argparse
+import html
+import importlib.util
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import pandas as pd
+
+from analitico import (
+    MotorFiltros, agregar_linhas, calcular_cubo, combinar_quarentenas, construir_serie_temporal, indicadores_mensais,
+    mensal_dos_filtros, montar_filtros, motor_cubo_linhas, normalizar_texto, resumir_categorias,
+    resumir_comunidade, resumir_regional, resumir_visao_geral,
+)
+from graficos import (
+    COR_FUNDO, COR_PRINCIPAL, COR_SECUNDARIA, COR_TEXTO, figura_comunidade, figuras_categorias, figuras_regional,
+    figuras_visao_geral,
+)
+from ingestao import carregar_arquivo, combinar_planilhas
+
+# Base carregada em cada processo de geração (ver iniciar_trabalhador)
+_BASE = {}
+
+ESTILO = f"""
+body {{ font-family: Poppins, sans-serif; color: {COR_TEXTO}; background: {COR_FUNDO}; margin: 0 auto; max-width: 1200px; padding: 24px; }}
+header {{ background: linear-gradient(135deg, {COR_PRINCIPAL} 0%, #333333 100%); color: white; padding: 24px; border-radius: 10px; }}
+header h1 {{ margin: 0; color: {COR_SECUNDARIA}; }}
+h2 {{ color: {COR_PRINCIPAL}; border-bottom: 3px solid {COR_SECUNDARIA}; padding-bottom: 4px; margin-top: 40px; }}
+.kpis {{ display: flex; flex-wrap: wrap; gap: 16px; margin: 16px 0; }}
+.kpi {{ flex: 1 1 160px; border-left: 4px solid {COR_SECUNDARIA}; padding: 8px 16px; background: #fafafa; }}
+.kpi .rotulo {{ font-size: 0.85rem; color: #666; }}
+.kpi .valor {{ font-size: 1.6rem; font-weight: 600; }}
+.kpi .delta {{ font-size: 0.85rem; color: #666; }}
+table.tabela {{ border-collapse: collapse; width: 100%; font-size: 0.9rem; }}
+table.tabela th {{ background: {COR_PRINCIPAL}; color: white; text-align: left; padding: 6px; }}
+table.tabela td {{ border-bottom: 1px solid #eee; padding: 6px; }}
+ul.contratos li {{ margin: 6px 0; }}
+"""
+
+
+# Processos de geração
+def iniciar_trabalhador(df, cubo):
+    """Prepara a base compartilhada pelos relatórios gerados neste processo"""
+    _BASE['df'] = df
+    _BASE['cubo'] = cubo
+    _BASE['motor'] = MotorFiltros(df)
+    _BASE['motor_cubo'] = motor_cubo_linhas(cubo, _BASE['motor'])
+    _BASE['serie'] = construir_serie_temporal(df)
+
+
+# Formatação
+def formatar_numero(valor, casas=0):
+    """Número com separadores brasileiros ('—' quando ausente)"""
+    if pd.isna(valor):
+        return "—"
+    texto = f"{valor:,.{casas}f}"
+    return texto.replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def formatar_variacao(variacao, referencia):
+    """Variação relativa com sinal, ou vazio quando não há base de comparação"""
+    if pd.isna(variacao):
+        return ""
+    sinal = '+' if variacao >= 0 else ''
+    return f"{sinal}{formatar_numero(variacao * 100, 1)}% vs {referencia}"
+
+
+def nome_pasta(contrato):
+    """Nome de pasta seguro para o contrato (sem acentos, espaços ou separadores)"""
+    return re.sub(r'[^a-z0-9]+', '_', normalizar_texto(contrato)).strip('_') or 'contrato'
+
+
+def html_kpis(kpis):
+    """Cartões de KPI a partir de (rótulo, valor, delta)"""
+    cartoes = ''.join(
+        f"<div class='kpi'><div class='rotulo'>{html.escape(rotulo)}</div>"
+        f"<div class='valor'>{html.escape(valor)}</div>"
+        f"<div class='delta'>{html.escape(delta or '')}</div></div>"
+        for rotulo, valor, delta in kpis
+    )
+    return f"<div class='kpis'>{cartoes}</div>"
+
+
+def html_tabela(tabela):
+    """Tabela resumo com números no formato brasileiro"""
+    formatadores = {
+        coluna: (lambda valor: formatar_numero(valor, 1)) if pd.api.types.is_float_dtype(tabela[coluna])
+        else formatar_numero
+        for coluna in tabela.columns if pd.api.types.is_numeric_dtype(tabela[coluna])
+    }
+    return tabela.to_html(index=False, border=0, classes='tabela', formatters=formatadores, na_rep='—')
+
+
+def html_figuras(figuras, incluir_plotly):
+    """Figuras como divs; o plotly.js é embutido uma única vez por página"""
+    partes = []
+    for figura in figuras:
+        if figura is None:
+            continue
+        partes.append(figura.to_html(full_html=False, include_plotlyjs=incluir_plotly))
+        incluir_plotly = False
+    return ''.join(partes), incluir_plotly
+
+
+def montar_pagina(titulo, subtitulo, corpo):
+    """Documento HTML completo com o estilo da empresa"""
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(titulo)}</title>
+<style>{ESTILO}</style>
+</head>
+<body>
+<header>
+<h1>⚡ {html.escape(titulo)}</h1>
+<p>{html.escape(subtitulo)}</p>
+</header>
+{corpo}
+</body>
+</html>
+"""
+
+
+def gravar(caminho, conteudo):
+    """Grava o arquivo de forma atômica (leitores nunca veem um relatório pela metade)"""
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        os.chmod(temporario, 0o644)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+# Geração
+def gerar_relatorio(contrato, periodo, pasta, pdf):
+    """Relatório de um contrato na pasta informada; retorna os totais para o índice"""
+    df, cubo = _BASE['df'], _BASE['cubo']
+    motor, motor_cubo = _BASE['motor'], _BASE['motor_cubo']
+
+    filtros = montar_filtros(periodo, {'Contrato': [contrato]})
+    cubo_filtrado = motor_cubo.fatiar(filtros)
+    indexador = motor.filtrar(filtros)
+
+    serie = _BASE['serie']
+    indicadores = indicadores_mensais(serie, mensal_dos_filtros(serie, motor_cubo, filtros), filtros)
+    visao_geral = resumir_visao_geral(cubo, cubo_filtrado, indicadores)
+    categorias = resumir_categorias(cubo_filtrado)
+    regional = resumir_regional(cubo_filtrado, agregar_linhas(df.iloc[indexador], ['Contrato', 'Colaborador']))
+    comunidade = resumir_comunidade(df.iloc[motor.restringir(indexador, 'Tipo', 'Comunidade')])
+
+    fig1, fig2, fig3, fig9 = figuras_visao_geral(visao_geral)
+    fig4, fig5 = figuras_categorias(categorias)
+    fig6, fig7 = figuras_regional(regional)
+    fig8 = figura_comunidade(comunidade)
+
+    kpis = [
+        ("Total de Ações", formatar_numero(visao_geral.acoes_filtradas), None),
+        ("Pessoas Impactadas", formatar_numero(visao_geral.total_pessoas), None),
+        ("Média de Participantes", formatar_numero(visao_geral.media_participantes), None),
+    ]
+    if not indicadores.empty:
+        atual = indicadores.iloc[-1]
+        kpis += [
+            (f"Ações em {atual['Mês_Nome']}", formatar_numero(atual['Qtd Ações']),
+             formatar_variacao(atual['Qtd Ações Var. Mês'], "mês anterior")),
+            ("Ações no mesmo mês do ano anterior", formatar_numero(atual['Qtd Ações Ano Anterior']),
+             formatar_variacao(atual['Qtd Ações Var. Ano'], "ano anterior")),
+            ("Ações nos últimos 12 meses", formatar_numero(atual['Qtd Ações 12M']), None),
+        ]
+
+    incluir_plotly = True
+    secoes = [f"<h2>📊 Visão Geral</h2>{html_kpis(kpis)}"]
+
+    trecho, incluir_plotly = html_figuras([fig1, fig2, fig3, fig9], incluir_plotly)
+    secoes.append(trecho)
+
+    trecho, incluir_plotly = html_figuras([fig4, fig5], incluir_plotly)
+    secoes.append(
+        f"<h2>📈 Análise por Categoria</h2>{trecho}"
+        f"<h3>📋 Tabela Resumo por Evento</h3>{html_tabela(categorias.tabela_eventos)}"
+    )
+
+    trecho, incluir_plotly = html_figuras([fig6, fig7], incluir_plotly)
+    secoes.append(
+        f"<h2>🗺️ Análise Regional</h2>{trecho}"
+        f"<h3>👥 Desempenho por Colaborador</h3>{html_tabela(regional.tabela_colaborador)}"
+    )
+
+    trecho, incluir_plotly = html_figuras([fig8], incluir_plotly)
+    secoes.append(
+        "<h2>🤝 Impacto Comunitário</h2>" + html_kpis([
+            ("Ações Comunitárias", formatar_numero(comunidade.acoes), None),
+            ("Pessoas da Comunidade", formatar_numero(comunidade.pessoas), None),
+            ("Média por Ação", formatar_numero(comunidade.media_pessoas), None),
+        ]) + (trecho or "<p>Nenhuma ação comunitária no período.</p>")
+    )
+
+    destino = os.path.join(pasta, nome_pasta(contrato))
+    os.makedirs(destino, exist_ok=True)
+    gravar(os.path.join(destino, 'relatorio.html'), montar_pagina(
+        "BI SESMT - Rezende Energia", f"Contrato: {contrato} · {descrever_periodo(df, periodo)}", ''.join(secoes)
+    ))
+
+    if pdf:
+        pasta_pdf = os.path.join(destino, 'graficos')
+        os.makedirs(pasta_pdf, exist_ok=True)
+        figuras = [fig1, fig2, fig3, fig9, fig4, fig5, fig6, fig7, fig8]
+        for numero, figura in enumerate(figuras, start=1):
+            if figura is not None:
+                figura.write_image(os.path.join(pasta_pdf, f"{numero:02d}_{nome_pasta(figura.layout.title.text)}.pdf"))
+
+    return {
+        'contrato': contrato,
+        'pasta': nome_pasta(contrato),
+        'acoes': visao_geral.acoes_filtradas,
+        'pessoas': visao_geral.total_pessoas,
+    }
+
+
+def descrever_periodo(df, periodo):
+    """Texto do período do relatório (todo o histórico quando não informado)"""
+    inicio, fim = periodo if periodo else (df['Data'].min(), df['Data'].max())
+    return f"Período: {inicio:%d/%m/%Y} a {fim:%d/%m/%Y} · Gerado em {datetime.now():%d/%m/%Y %H:%M}"
+
+
+def gravar_indice(pasta, resultados, df, periodo):
+    """index.html com os totais e o link de cada contrato"""
+    itens = ''.join(
+        f"<li><a href='{resultado['pasta']}/relatorio.html'>{html.escape(str(resultado['contrato']))}</a> — "
+        f"{formatar_numero(resultado['acoes'])} ações · {formatar_numero(resultado['pessoas'])} pessoas impactadas</li>"
+        for resultado in resultados
+    )
+    gravar(os.path.join(pasta, 'index.html'), montar_pagina(
+        "BI SESMT - Rezende Energia", descrever_periodo(df, periodo),
+        f"<h2>Relatórios por Contrato</h2><ul class='contratos'>{itens}</ul>"
+    ))
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('planilhas', nargs='+', help='planilhas de acompanhamento (.xlsx)')
+    parser.add_argument('--saida', default='relatorios', help='pasta dos relatórios (padrão: relatorios)')
+    parser.add_argument('--contratos', nargs='+', help='contratos a gerar (padrão: todos)')
+    parser.add_argument('--inicio', type=date.fromisoformat, help='início do período (AAAA-MM-DD)')
+    parser.add_argument('--fim', type=date.fromisoformat, help='fim do período (AAAA-MM-DD)')
+    parser.add_argument('--pdf', action='store_true', help='exporta também os gráficos em PDF (requer kaleido)')
+    parser.add_argument('--trabalhadores', type=int, default=os.cpu_count() or 1,
+                        help='processos em paralelo (padrão: núcleos da máquina; 1 gera em sequência)')
+    args = parser.parse_args(argumentos)
+
+    if args.pdf and importlib.util.find_spec('kaleido') is None:
+        parser.error("--pdf requer o pacote kaleido (pip install kaleido)")
+
+    inicio_geral = time.perf_counter()
+    carregadas = {caminho: carregar_arquivo(caminho) for caminho in args.planilhas}
+    df, _, _, duplicadas = combinar_planilhas([df_arquivo for _, df_arquivo, _ in carregadas.values()])
+    cubo = calcular_cubo(df)
+    print(f"{len(df)} registros carregados de {len(args.planilhas)} planilha(s)"
+          f"{f' ({duplicadas} repetidos ignorados)' if duplicadas else ''}")
+
+    os.makedirs(args.saida, exist_ok=True)
+    quarentena = combinar_quarentenas(
+        {os.path.basename(caminho): carregada[2] for caminho, carregada in carregadas.items()}
+    )
+    if len(quarentena):
+        caminho_quarentena = os.path.join(args.saida, 'quarentena.csv')
+        quarentena.to_csv(caminho_quarentena, index=False)
+        print(f"{len(quarentena)} linha(s) inválida(s) fora dos relatórios: {caminho_quarentena}")
+
+    contratos = list(df['Contrato'].cat.categories)
+    if args.contratos:
+        desconhecidos = sorted(set(args.contratos) - set(contratos))
+        if desconhecidos:
+            parser.error(f"contratos não encontrados: {', '.join(desconhecidos)}")
+        contratos = [contrato for contrato in contratos if contrato in args.contratos]
+
+    periodo = ()
+    if args.inicio or args.fim:
+        periodo = (args.inicio or df['Data'].min().date(), args.fim or df['Data'].max().date())
+
+    tarefas = [(contrato, periodo, args.saida, args.pdf) for contrato in contratos]
+    trabalhadores = max(1, min(args.trabalhadores, len(tarefas)))
+
+    if trabalhadores == 1:
+        iniciar_trabalhador(df, cubo)
+        resultados = [gerar_relatorio(*tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(trabalhadores, initializer=iniciar_trabalhador, initargs=(df, cubo)) as executor:
+            resultados = list(executor.map(gerar_relatorio, *zip(*tarefas)))
+
+    for resultado in resultados:
+        print(f"  {resultado['contrato']}: {os.path.join(args.saida, resultado['pasta'], 'relatorio.html')}")
+
+    gravar_indice(args.saida, resultados, df, periodo)
+    print(f"{len(resultados)} relatório(s) em {time.perf_counter() - inicio_geral:.1f} s")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import os
+from datetime import date, datetime, time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+import analitico
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    """Snapshots gravados numa pasta temporária"""
+    monkeypatch.setattr(analitico, 'PASTA_SNAPSHOTS', str(tmp_path))
+
+
+def montar_dados(**colunas):
+    """Linhas processadas com valores padrão nas colunas não informadas"""
+    quantidade = len(next(iter(colunas.values())))
+    dados = {
+        'Data': pd.date_range('2024-01-01', periods=quantidade, freq='D'),
+        'Evento': ['DDS'] * quantidade,
+        'Pessoas Impactadas': [10] * quantidade,
+        'Observações': ['ok'] * quantidade,
+        'Colaborador': ['Ana'] * quantidade,
+        'Cargo': ['Técnico'] * quantidade,
+        'Contrato': ['Sul'] * quantidade,
+        'Tipo': ['Interno'] * quantidade,
+    }
+    dados.update(colunas)
+    return analitico.processar_dados(pd.DataFrame(dados))
+
+
+def test_converter_datas_aceita_excel_serial_e_texto():
+    serie = pd.Series([
+        datetime(2024, 3, 5, 8, 30), 45000, 45000.5, '05/03/2024', '2024-03-06', date(2024, 3, 7),
+        time(8, 30), 'ontem', None,
+    ], dtype=object)
+
+    assert analitico.converter_datas(serie).tolist()[:6] == [
+        pd.Timestamp('2024-03-05 08:30'), pd.Timestamp('2023-03-15'), pd.Timestamp('2023-03-15 12:00'),
+        pd.Timestamp('2024-03-05'), pd.Timestamp('2024-03-06'), pd.Timestamp('2024-03-07'),
+    ]
+    # Horário sem data, texto inválido e ausente
+    assert analitico.converter_datas(serie)[6:].isna().all()
+
+
+def test_converter_numeros_aceita_separadores_brasileiros():
+    serie = pd.Series(['1.234,5', '12,5', '1.234', '1.5', 7, 'abc', None, True], dtype=object)
+    numeros = analitico.converter_numeros(serie)
+
+    assert numeros[:5].tolist() == [1234.5, 12.5, 1234.0, 1.5, 7.0]
+    assert numeros[5:].isna().all()
+
+
+def test_validar_lote_separa_linhas_invalidas_com_os_motivos():
+    lote = pd.DataFrame({
+        'Data': [datetime(2024, 1, 2), None, 'xx', time(9, 0), '03/01/2024'],
+        'Evento': ['DDS', 'DDS', 'DDS', 'DDS', ' Inspeção '],
+        'Pessoas Impactadas': ['10', '5', -1, '2,5', '1.000'],
+        'Observações': [None] * 5,
+        'Colaborador': ['Ana', 'Ana', 'Ana', 'Ana', 42],
+        'Cargo': ['Técnico'] * 5,
+        'Contrato': ['Sul'] * 5,
+        'Tipo': ['Interno'] * 5,
+    }, dtype=object)
+
+    validas, quarentena = analitico.validar_lote(lote, 'Ações', [2, 3, 4, 5, 6])
+
+    assert validas['Data'].tolist() == [pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-03')]
+    assert validas['Pessoas Impactadas'].tolist() == [10.0, 1000.0]
+    assert validas['Evento'].tolist() == ['DDS', 'Inspeção']
+    assert validas['Colaborador'].tolist() == ['Ana', '42']
+    assert isinstance(validas['Contrato'].dtype, pd.CategoricalDtype)
+    assert quarentena[['Aba', 'Linha', 'Problemas']].values.tolist() == [
+        ['Ações', 3, 'Data ausente'],
+        ['Ações', 4, 'Data inválida; Pessoas Impactadas negativo'],
+        ['Ações', 5, 'Data inválida; Pessoas Impactadas fracionário'],
+    ]
+    # Valores originais preservados como texto
+    assert quarentena['Pessoas Impactadas'].tolist() == ['5', '-1', '2,5']
+
+
+def test_periodo_inclui_o_dia_final_inteiro():
+    df = montar_dados(Data=pd.to_datetime(['2024-01-01 09:00', '2024-01-02 14:30', '2024-01-03 08:00']))
+    periodo = (pd.Timestamp('2024-01-01').date(), pd.Timestamp('2024-01-02').date())
+
+    filtros = analitico.montar_filtros(periodo, {})
+    motor = analitico.MotorFiltros(df)
+    linhas = df.iloc[motor.filtrar(filtros)]
+    cubo_filtrado = analitico.motor_cubo_linhas(analitico.calcular_cubo(df), motor).fatiar(filtros)
+
+    assert len(linhas) == 2
+    assert cubo_filtrado['Qtd Ações'].sum() == len(linhas)
+
+
+def test_lotes_combinados_ordenam_por_evento():
+    lotes = [
+        montar_dados(Evento=['Meio', 'Zeta']),
+        montar_dados(Evento=['Alfa', 'Beta']),
+    ]
+    df = analitico.processar_dados(analitico.combinar_lotes(lotes))
+
+    assert list(df['Evento'].cat.categories) == ['Alfa', 'Beta', 'Meio', 'Zeta']
+    chaves = analitico.chave_ordenacao(df['Evento'])
+    posicoes = analitico.ordenar_posicoes(chaves, df.index.to_numpy())
+    assert list(df['Evento'].iloc[posicoes]) == ['Alfa', 'Beta', 'Meio', 'Zeta']
+
+
+@pytest.mark.parametrize('periodo', [
+    ('2024-01-01', '2024-03-31'),
+    ('2024-01-15', '2024-03-10'),
+    ('2024-02-03', '2024-02-20'),
+    ('2024-01-31', '2024-02-01'),
+])
+@pytest.mark.parametrize('selecoes', [
+    {},
+    {'Tipo': ['Interno']},
+    {'Tipo': ['Interno'], 'Evento': ['DDS', 'Blitz']},
+    {'Colaborador': ['Bia']},
+])
+def test_cubo_mensal_confere_com_as_linhas(periodo, selecoes):
+    rng = np.random.default_rng(0)
+    quantidade = 500
+    df = montar_dados(
+        Data=pd.Timestamp('2023-12-20') + pd.to_timedelta(rng.integers(0, 120 * 24, quantidade), unit='h'),
+        Tipo=rng.choice(['Interno', 'Comunidade'], quantidade),
+        Evento=rng.choice(['DDS', 'SIPAT', 'Blitz'], quantidade),
+        Colaborador=rng.choice(['Ana', 'Bia', 'Caio'], quantidade),
+        **{'Pessoas Impactadas': rng.integers(0, 50, quantidade)},
+    )
+    date_range = tuple(pd.Timestamp(data).date() for data in periodo)
+    filtros = analitico.montar_filtros(date_range, selecoes)
+
+    # Filtro direto das linhas, com o último dia inteiro
+    inicio, fim = pd.Timestamp(periodo[0]), pd.Timestamp(periodo[1]) + pd.Timedelta(days=1)
+    mascara = (df['Data'] >= inicio) & (df['Data'] < fim)
+    for coluna, valores in selecoes.items():
+        mascara &= df[coluna].isin(valores)
+    esperado = analitico.agregar_linhas(df[mascara], ['Evento'])
+
+    cubo = analitico.calcular_cubo(df)
+    motor_cubo = analitico.motor_cubo_linhas(cubo, analitico.MotorFiltros(df))
+    obtido = analitico.agregar_cubo(motor_cubo.fatiar(filtros), ['Evento'])
+
+    assert obtido[analitico.MEDIDAS_CUBO].equals(esperado[analitico.MEDIDAS_CUBO])
+    assert len(cubo) < len(df) / 5
+
+    # Facetas: cada coluna considera só as seleções das demais
+    for coluna in ['Tipo', 'Evento', 'Colaborador']:
+        mascara_faceta = (df['Data'] >= inicio) & (df['Data'] < fim)
+        for outra, valores in selecoes.items():
+            if outra != coluna:
+                mascara_faceta &= df[outra].isin(valores)
+        contagem = motor_cubo.contagens(filtros, coluna)
+        esperada = df.loc[mascara_faceta, coluna].value_counts()
+        assert contagem[contagem > 0].to_dict() == esperada[esperada > 0].to_dict()
+
+
+def test_normalizar_coluna_ignora_acentos_e_vazios():
+    categorias = pd.Series(['Ação', None, 'CAMINHÃO'], dtype='category')
+    assert list(analitico.normalizar_coluna(categorias)) == ['acao', '', 'caminhao']
+
+    textos = pd.Series(['Óleo Diesel', None, 12])
+    assert list(analitico.normalizar_coluna(textos)) == ['oleo diesel', '', '12']
+
+    datas = pd.Series(pd.to_datetime(['2024-03-05 10:30', None]))
+    assert list(analitico.normalizar_coluna(datas)) == ['05/03/2024', '']
+
+
+def test_pesquisa_exige_todos_os_termos():
+    df = montar_dados(
+        Evento=['Ação comunitária', 'Blitz', 'DDS'],
+        Colaborador=['João', 'Maria', 'joão'],
+        Observações=['escola [centro]', 'ação na escola', None],
+    )
+    indice = analitico.construir_indice_busca(df)
+
+    assert list(analitico.pesquisar(indice, df.index, 'ACAO escola')) == [True, True, False]
+    assert list(analitico.pesquisar(indice, df.index, 'joao', 'Colaborador')) == [True, False, True]
+    assert list(analitico.pesquisar(indice, df.index, 'acao', 'Evento')) == [True, False, False]
+    # Metacaracteres de regex são procurados literalmente
+    assert list(analitico.pesquisar(indice, df.index, '[centro]')) == [True, False, False]
+    # Apenas as linhas informadas (já filtradas) são pesquisadas
+    assert list(analitico.pesquisar(indice, df.index[1:], 'escola')) == [True, False]
+    # Um termo não casa atravessando o limite entre colunas
+    assert not analitico.pesquisar(indice, df.index, 'blitz10').any()
+
+
+def test_anexar_ineditos_descarta_registros_ja_vistos():
+    primeira = montar_dados(Evento=['DDS', 'DDS', 'SIPAT'], Data=pd.to_datetime(['2024-01-01'] * 3))
+    segunda = montar_dados(Evento=['SIPAT', 'Blitz'], Data=pd.to_datetime(['2024-01-01'] * 2))
+
+    partes, chaves, duplicadas = analitico.anexar_ineditos([primeira, segunda])
+
+    # Repetições dentro da mesma planilha ficam; entre planilhas, só a primeira ocorrência
+    assert list(partes[0]['Evento']) == ['DDS', 'DDS', 'SIPAT']
+    assert list(partes[1]['Evento']) == ['Blitz']
+    assert duplicadas == 1
+
+    # Chaves acumuladas valem para anexos posteriores
+    terceira = montar_dados(Evento=['Blitz', 'DDS', 'Treinamento'], Data=pd.to_datetime(['2024-01-01'] * 3))
+    partes, _, duplicadas = analitico.anexar_ineditos([terceira], chaves)
+    assert list(partes[0]['Evento']) == ['Treinamento']
+    assert duplicadas == 2
+
+
+def test_snapshot_preserva_tipos(snapshots):
+    df = montar_dados(Observações=['ok', None, 'chuva forte'])
+    analitico.salvar_snapshot('teste', df)
+
+    recarregado = analitico.ler_snapshot('teste')
+    assert recarregado['Observações'].dtype == pd.StringDtype('pyarrow')
+    assert recarregado.equals(df)
+
+
+def test_snapshots_antigos_sao_podados(snapshots, tmp_path, monkeypatch):
+    monkeypatch.setattr(analitico, 'LIMITE_SNAPSHOTS', 3)
+    (tmp_path / f'velho-v{analitico.VERSAO_SNAPSHOT - 1}.feather').write_bytes(b'')
+    df = montar_dados(Evento=['DDS'])
+
+    for indice, chave in enumerate(['a', 'b', 'c']):
+        analitico.salvar_snapshot(chave, df)
+        os.utime(analitico.caminho_snapshot(chave), (indice, indice))
+    # Ler 'a' conta como uso recente: o menos usado passa a ser 'b'
+    analitico.ler_snapshot('a')
+    analitico.salvar_snapshot('d', df)
+
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(analitico.caminho_snapshot(chave)) for chave in 'acd']
+
+
+@pytest.fixture
+def dados_exportacao(monkeypatch):
+    """Cinco linhas exportadas em blocos de duas, numa ordem diferente da original"""
+    monkeypatch.setattr(analitico, 'TAMANHO_BLOCO_EXPORTACAO', 2)
+    df = montar_dados(
+        Evento=['DDS', 'SIPAT', 'Blitz', 'DDS', 'Inspeção'],
+        Observações=['ok', None, 'escola, centro', 'ok', 'ação'],
+        **{'Pessoas Impactadas': [10, 20, np.nan, 40, 50]},
+    )
+    return df, np.array([4, 0, 2, 3])
+
+
+def test_exportar_csv_em_blocos(dados_exportacao, tmp_path):
+    df, posicoes = dados_exportacao
+    destino = tmp_path / 'acoes.csv'
+
+    analitico.exportar_csv(analitico.blocos_exportacao(df, posicoes), destino)
+    exportado = pd.read_csv(destino, encoding='utf-8-sig')
+
+    assert list(exportado.columns) == analitico.COLUNAS_EXIBICAO
+    assert list(exportado['Evento']) == ['Inspeção', 'DDS', 'Blitz', 'DDS']
+    assert list(exportado['Data']) == ['05/01/2024', '01/01/2024', '03/01/2024', '04/01/2024']
+    assert exportado['Observações'][2] == 'escola, centro'
+
+    # Seleção vazia ainda gera o cabeçalho
+    analitico.exportar_csv(analitico.blocos_exportacao(df, np.empty(0, dtype=np.intp)), destino)
+    assert list(pd.read_csv(destino, encoding='utf-8-sig').columns) == analitico.COLUNAS_EXIBICAO
+
+
+def test_exportar_parquet_preserva_tipos(dados_exportacao, tmp_path):
+    df, posicoes = dados_exportacao
+    destino = tmp_path / 'acoes.parquet'
+
+    analitico.exportar_parquet(analitico.blocos_exportacao(df, posicoes), destino)
+    exportado = pd.read_parquet(destino)
+
+    assert pd.api.types.is_datetime64_any_dtype(exportado['Data'])
+    assert isinstance(exportado['Evento'].dtype, pd.CategoricalDtype)
+    assert list(exportado['Evento']) == ['Inspeção', 'DDS', 'Blitz', 'DDS']
+    assert exportado['Pessoas Impactadas'].isna().tolist() == [False, False, True, False]
+
+
+def test_exportar_xlsx_grava_datas_e_respeita_limite(dados_exportacao, tmp_path, monkeypatch):
+    df, posicoes = dados_exportacao
+    destino = tmp_path / 'acoes.xlsx'
+
+    analitico.exportar_xlsx(analitico.blocos_exportacao(df, posicoes), destino)
+    linhas = list(openpyxl.load_workbook(destino).active.values)
+
+    assert list(linhas[0]) == analitico.COLUNAS_EXIBICAO
+    assert [linha[1] for linha in linhas[1:]] == ['Inspeção', 'DDS', 'Blitz', 'DDS']
+    assert linhas[1][0] == pd.Timestamp('2024-01-05').to_pydatetime()
+    assert linhas[3][2] is None
+
+    monkeypatch.setattr(analitico, 'LIMITE_LINHAS_XLSX', 3)
+    with pytest.raises(ValueError):
+        analitico.exportar_xlsx(analitico.blocos_exportacao(df, posicoes), destino)
+
+
+def test_indicadores_mensais_comparam_meses_de_calendario():
+    # Jan/2023: 2 ações, Mar/2023: 1, Jan/2024: 4, Fev/2024: 3; demais meses sem registros
+    datas = ['2023-01-05', '2023-01-20', '2023-03-10'] + ['2024-01-02'] * 4 + ['2024-02-27'] * 3
+    df = montar_dados(Data=pd.to_datetime(datas))
+    serie = analitico.construir_serie_temporal(df)
+    filtros = analitico.montar_filtros((pd.Timestamp('2024-01-01').date(), pd.Timestamp('2024-02-15').date()), {})
+
+    indicadores = analitico.indicadores_mensais(serie, serie.mensal, filtros).set_index('Mês')
+    janeiro, fevereiro = indicadores.loc[pd.Period('2024-01')], indicadores.loc[pd.Period('2024-02')]
+
+    assert list(indicadores['Mês_Nome']) == ['Janeiro/2024', 'Fevereiro/2024']
+    assert list(indicadores['Qtd Ações']) == [4, 3]
+    assert janeiro['Qtd Ações Mês Anterior'] == 0 and np.isnan(janeiro['Qtd Ações Var. Mês'])
+    assert janeiro['Qtd Ações Ano Anterior'] == 2 and janeiro['Qtd Ações Var. Ano'] == 1.0
+    assert fevereiro['Qtd Ações Var. Mês'] == -0.25 and np.isnan(fevereiro['Qtd Ações Var. Ano'])
+    assert list(indicadores['Qtd Ações 3M']) == [4, 7]
+    assert list(indicadores['Qtd Ações 12M']) == [5, 8]
+    assert list(indicadores['Qtd Ações Acumulado']) == [7, 10]
+    assert list(indicadores['Total Pessoas Acumulado']) == [70, 100]
+
+    # Sem período, todos os meses do histórico, inclusive os vazios
+    completo = analitico.indicadores_mensais(serie, serie.mensal, (None, None, ()))
+    assert len(completo) == 14
+    assert list(completo['Qtd Ações'][:3]) == [2, 0, 1]
+
+
+@pytest.mark.parametrize('selecoes', [{'Contrato': ['Sul']}, {'Evento': ['SIPAT']}])
+def test_mensal_dos_filtros_confere_com_as_linhas(selecoes):
+    df = montar_dados(
+        Data=pd.to_datetime(['2024-01-03', '2024-01-20', '2024-02-11', '2024-04-02']),
+        Contrato=['Sul', 'Norte', 'Sul', 'Norte'],
+        Evento=['SIPAT', 'SIPAT', 'DDS', 'SIPAT'],
+    )
+    serie = analitico.construir_serie_temporal(df)
+    motor_cubo = analitico.motor_cubo_linhas(analitico.calcular_cubo(df), analitico.MotorFiltros(df))
+    filtros = analitico.montar_filtros((), selecoes)
+
+    mensal = analitico.mensal_dos_filtros(serie, motor_cubo, filtros)
+    indicadores = analitico.indicadores_mensais(serie, mensal, filtros)
+
+    coluna, valores = next(iter(selecoes.items()))
+    esperado = df[df[coluna].isin(valores)].groupby('Mês').size()
+    esperado = esperado.reindex(pd.period_range('2024-01', '2024-04', freq='M'), fill_value=0)
+    assert list(indicadores['Qtd Ações']) == list(esperado)
@@ -0,0 +1,72 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import analitico
+import ingestao
+
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    """Pasta monitorada vazia, com os snapshots isolados do projeto"""
+    monkeypatch.setattr(analitico, 'PASTA_SNAPSHOTS', str(tmp_path / 'snapshots'))
+    monitorada = tmp_path / 'monitorada'
+    monitorada.mkdir()
+    return monitorada
+
+
+def gravar_planilha(pasta, nome, datas):
+    """Planilha com uma ação por data, já estável (modificada antes de ESTABILIZACAO_S)"""
+    caminho = pasta / nome
+    pd.DataFrame({
+        'Data': pd.to_datetime(datas),
+        'Evento': 'DDS',
+        'Pessoas Impactadas': 10,
+        'Observações': 'ok',
+        'Colaborador': 'Ana',
+        'Cargo': 'Técnico',
+        'Contrato': 'Sul',
+        'Tipo': 'Interno',
+    }).to_excel(caminho, index=False)
+
+    antigo = time.time() - ingestao.ESTABILIZACAO_S - 10
+    os.utime(caminho, (antigo, antigo))
+    return caminho
+
+
+def test_verificacoes_seguidas_acompanham_a_pasta(pasta):
+    monitor = ingestao.MonitorPasta(str(pasta))
+    gravar_planilha(pasta, 'a.xlsx', ['2024-01-02', '2024-01-03'])
+
+    assert monitor.verificar()
+    assert monitor.atual.versao == 1
+    assert len(monitor.atual.df) == 2
+
+    # Sem mudanças na pasta, a versão publicada é mantida
+    assert not monitor.verificar()
+    assert monitor.erro is None
+
+    gravar_planilha(pasta, 'b.xlsx', ['2024-02-05'])
+    assert monitor.verificar()
+    assert monitor.atual.versao == 2
+    assert monitor.atual.arquivos == ('a.xlsx', 'b.xlsx')
+    assert len(monitor.atual.df) == 3
+
+    os.remove(pasta / 'a.xlsx')
+    assert monitor.verificar()
+    assert monitor.atual.versao == 3
+    assert len(monitor.atual.df) == 1
+    assert monitor.erro is None
+
+
+def test_quarentena_da_pasta_identifica_o_arquivo(pasta):
+    monitor = ingestao.MonitorPasta(str(pasta))
+    gravar_planilha(pasta, 'a.xlsx', ['2024-01-02', None])
+
+    assert monitor.verificar()
+    assert len(monitor.atual.df) == 1
+    assert monitor.atual.quarentena[['Arquivo', 'Linha', 'Problemas']].values.tolist() == [
+        ['a.xlsx', 3, 'Data ausente']
+    ]